@@ -1,10 +1,9 @@
 import streamlit as st
-from html_docs import get_response as get_html_response
-from git_docs import get_response as get_git_response
-from sql_docs import get_response as get_sql_response
-from cpp_docs import get_response as get_cpp_response
-from django_docs import get_response as get_django_response
-from devops_docs import get_response as get_devops_response
+
+import metrics
+import settings
+from request_trace import RequestTrace
+from topics import TOPICS, load_topic, warm_topic
 
 # Set page config
 st.set_page_config(
@@ -48,6 +47,41 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False)
+def get_topic_engine(topic):
+    """Load a topic's engine once per process and share it across sessions"""
+    return load_topic(topic)
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    """Serve /metrics once per process when METRICS_PORT is set"""
+    if settings.METRICS_PORT:
+        return metrics.start_metrics_server(settings.METRICS_PORT)
+    return None
+
+start_metrics_server()
+
+def show_debug_info(trace):
+    """Render the last request's trace in the sidebar"""
+    st.caption(f"Route: {trace['route']} · total {trace['total_time'] or 0:.3f}s")
+    st.table({
+        "stage": list(trace["stages"]),
+        "seconds": [f"{seconds:.3f}" for seconds in trace["stages"].values()],
+    })
+    estimated = " (estimated)" if trace["tokens_estimated"] else ""
+    st.write(f"Tokens{estimated}: {trace['prompt_tokens']} prompt / {trace['response_tokens']} response")
+    st.write(
+        "Cache hits: " + (", ".join(name for name, hit in trace["cache_hits"].items() if hit) or "none")
+    )
+    if trace["chunks"]:
+        st.table({
+            "chunk": [chunk["id"][:8] for chunk in trace["chunks"]],
+            "score": [f"{chunk['score']:.3f}" for chunk in trace["chunks"]],
+            "source": [chunk["source"] for chunk in trace["chunks"]],
+        })
+    with st.expander("Prometheus metrics"):
+        st.code(metrics.render(), language="text")
+
 # Initialize session state for chat history
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = {}
@@ -61,29 +95,20 @@ with st.sidebar:
     st.write("Select a documentation to chat with:")
     
     # Topic buttons
-    if st.button("HTML Documentation", key="html"):
-        st.session_state.current_topic = "HTML"
-        st.session_state.chat_history["HTML"] = []
+    for topic, info in TOPICS.items():
+        if st.button(info["label"], key=info["key"]):
+            st.session_state.current_topic = topic
+            st.session_state.chat_history[topic] = []
+            # Start connecting while the user types the first question
+            warm_topic(topic, get_topic_engine)
     
-    if st.button("Git Documentation", key="git"):
-        st.session_state.current_topic = "Git"
-        st.session_state.chat_history["Git"] = []
-    
-    if st.button("SQL Documentation", key="sql"):
-        st.session_state.current_topic = "SQL"
-        st.session_state.chat_history["SQL"] = []
-    
-    if st.button("C++ Documentation", key="cpp"):
-        st.session_state.current_topic = "C++"
-        st.session_state.chat_history["C++"] = []
-    
-    if st.button("Django Documentation", key="django"):
-        st.session_state.current_topic = "Django"
-        st.session_state.chat_history["Django"] = []
-    
-    if st.button("DevOps Documentation", key="devops"):
-        st.session_state.current_topic = "DevOps"
-        st.session_state.chat_history["DevOps"] = []
+    # Per-request timings, retrieved chunks, tokens and cache hits
+    st.markdown("---")
+    if st.toggle("🔧 Debug info", value=settings.DEBUG_SIDEBAR):
+        if st.session_state.get("last_trace"):
+            show_debug_info(st.session_state.last_trace)
+        else:
+            st.caption("Ask a question to see its timings.")
 
 # Main content area
 st.title("ChaiDocs - Documentation Assistant")
@@ -116,9 +141,16 @@ else:
             for message in st.session_state.chat_history[st.session_state.current_topic]:
                 with st.chat_message(message["role"]):
                     st.write(message["content"])
-                    if "sources" in message:
+                    if message.get("trace") and message["trace"]["total_time"] is not None:
+                        st.caption(
+                            f"First token after {message['trace']['time_to_first_token']:.2f}s · "
+                            f"complete after {message['trace']['total_time']:.2f}s"
+                        )
+                    if message.get("sources"):
                         with st.expander("Source References"):
-                            st.write(message["sources"])
+                            for source in message["sources"]:
+                                title = source["title"] or source["source"]
+                                st.markdown(f"- [{title}]({source['source']}) · score {source['score']:.3f}")
     
     # User input
     user_input = st.chat_input("Ask your question...")
@@ -130,33 +162,31 @@ else:
             "content": user_input
         })
         
-        # Get response based on current topic
-        with st.spinner("Searching for answers..."):
-            try:
-                if st.session_state.current_topic == "HTML":
-                    response = get_html_response(user_input)
-                elif st.session_state.current_topic == "Git":
-                    response = get_git_response(user_input)
-                elif st.session_state.current_topic == "SQL":
-                    response = get_sql_response(user_input)
-                elif st.session_state.current_topic == "C++":
-                    response = get_cpp_response(user_input)
-                elif st.session_state.current_topic == "Django":
-                    response = get_django_response(user_input)
-                elif st.session_state.current_topic == "DevOps":
-                    response = get_devops_response(user_input)
-                
-                # Add assistant response to chat history
-                st.session_state.chat_history[st.session_state.current_topic].append({
-                    "role": "assistant",
-                    "content": response
-                })
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
-                st.session_state.chat_history[st.session_state.current_topic].append({
-                    "role": "assistant",
-                    "content": "I'm sorry, I encountered an error while processing your request. Please try again."
-                })
+        # Stream the answer into the chat as it is generated
+        with chat_container:
+            with st.chat_message("user"):
+                st.write(user_input)
+            with st.chat_message("assistant"):
+                try:
+                    with st.spinner("Searching for answers..."):
+                        engine = get_topic_engine(st.session_state.current_topic)
+                    trace = RequestTrace(engine.collection_name, user_input)
+                    response = st.write_stream(engine.stream_response(user_input, trace=trace))
+                    st.session_state.last_trace = trace.to_dict()
+                    
+                    # Add assistant response to chat history
+                    st.session_state.chat_history[st.session_state.current_topic].append({
+                        "role": "assistant",
+                        "content": response,
+                        "trace": st.session_state.last_trace,
+                        "sources": trace.sources()
+                    })
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+                    st.session_state.chat_history[st.session_state.current_topic].append({
+                        "role": "assistant",
+                        "content": "I'm sorry, I encountered an error while processing your request. Please try again."
+                    })
         
         # Rerun to update the chat display
         st.rerun()
@@ -0,0 +1,111 @@
+"""
+Semantic answer cache for a single collection.
+
+Paraphrased questions usually embed to nearly the same vector. When a new
+question's embedding is within `threshold` cosine similarity of a cached
+question, the stored answer is returned and the LLM call is skipped. Entries
+expire after `ttl` seconds, the least recently used entry is evicted once
+`max_size` is reached, and the whole cache is dropped when the collection's
+index version changes.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from index_state import get_index_version
+
+
+class SemanticAnswerCache:
+    """Answers keyed on query-vector similarity for one collection"""
+
+    def __init__(self, collection_name, threshold=0.95, ttl=3600, max_size=512):
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._vectors = []
+        self._answers = []
+        self._created = []
+        self._last_used = []
+        self._matrix = None
+        self._index_version = get_index_version(collection_name)
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self._vectors, self._answers = [], []
+        self._created, self._last_used = [], []
+        self._matrix = None
+
+    def _remove(self, positions):
+        for i in sorted(positions, reverse=True):
+            del self._vectors[i], self._answers[i], self._created[i], self._last_used[i]
+        self._matrix = None
+
+    def _check_index_version(self):
+        version = get_index_version(self.collection_name)
+        if version != self._index_version:
+            self._reset()
+            self._index_version = version
+
+    def _expire(self, now):
+        expired = [i for i, created in enumerate(self._created) if now - created > self.ttl]
+        if expired:
+            self._remove(expired)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector):
+        """Return a cached answer for a similar question, or None"""
+        with self._lock:
+            now = time.monotonic()
+            self._check_index_version()
+            self._expire(now)
+            if not self._vectors:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            scores = self._matrix @ self._normalize(vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return self._answers[best]
+
+    def store(self, vector, answer):
+        """Remember the answer given for a question's embedding"""
+        with self._lock:
+            now = time.monotonic()
+            self._check_index_version()
+            if len(self._vectors) >= self.max_size:
+                self._remove([int(np.argmin(self._last_used))])
+            self._vectors.append(self._normalize(vector))
+            self._answers.append(answer)
+            self._created.append(now)
+            self._last_used.append(now)
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "collection": self.collection_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._vectors),
+            }
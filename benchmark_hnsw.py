@@ -0,0 +1,153 @@
+"""
+Recall@k versus latency for HNSW settings, against exact search.
+
+The collection's points are copied into temporary collections built with each
+(m, ef_construct) pair, and every collection is queried with each search-time
+ef. The query set is fixed: the questions in benchmark_questions.json (embedded
+through the query-embedding cache) or, with --sampled, stored vectors with a
+little noise and a fixed seed. Ground truth is exact (brute-force) search on
+the original collection.
+
+    python benchmark_hnsw.py --collection html-docs
+    python benchmark_hnsw.py --collection html-docs --sampled 200 --output hnsw.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+import settings
+from benchmark_quantization import read_points
+
+BUILD_SETTINGS = [(8, 64), (16, 100), (32, 200)]
+EF_SETTINGS = [16, 32, 64, 128]
+
+
+def load_queries(questions_path, collection_name, points, sampled=0, seed=0):
+    """Return a fixed list of query vectors for a collection"""
+    if sampled:
+        rng = np.random.default_rng(seed)
+        rows = rng.integers(0, len(points), size=sampled)
+        dimension = len(points[0].vector)
+        return [(np.asarray(points[row].vector) + rng.normal(0, 0.01, size=dimension)).tolist() for row in rows]
+
+    from docs_engine import get_embeddings
+    from topics import TOPICS
+    with open(questions_path, encoding="utf-8") as f:
+        questions = json.load(f)
+    embeddings = get_embeddings()
+    return [
+        embeddings.embed_query(item["question"])
+        for item in questions
+        if f"{TOPICS[item['topic']]['key']}-docs" == collection_name
+    ]
+
+
+def build_hnsw_collection(client, points, target, m, ef_construct, batch_size=256):
+    if client.collection_exists(target):
+        client.delete_collection(target)
+    client.create_collection(
+        target,
+        vectors_config=models.VectorParams(size=len(points[0].vector), distance=models.Distance.COSINE),
+        # Small thresholds so even small collections get (and use) an HNSW graph
+        hnsw_config=models.HnswConfigDiff(m=m, ef_construct=ef_construct, full_scan_threshold=10),
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=10),
+    )
+    for start in range(0, len(points), batch_size):
+        client.upsert(
+            target,
+            points=[models.PointStruct(id=p.id, vector=p.vector) for p in points[start:start + batch_size]],
+        )
+    while client.get_collection(target).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def query_ids(client, collection_name, vector, k, search_params):
+    points = client.query_points(collection_name, query=vector, limit=k, search_params=search_params).points
+    return [str(point.id) for point in points]
+
+
+def benchmark(client, collection_name, queries, points, k=4):
+    # Skip quantized vectors too, so the reference is full-precision on a --quantization collection
+    exact = models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))
+    truth = []
+    exact_times = []
+    for vector in queries:
+        start = time.perf_counter()
+        truth.append(set(query_ids(client, collection_name, vector, k, exact)))
+        exact_times.append(time.perf_counter() - start)
+
+    rows = [{
+        "m": None,
+        "ef_construct": None,
+        "ef": None,
+        "recall_at_k": 1.0,
+        "p50_ms": float(np.percentile(exact_times, 50) * 1000),
+        "p99_ms": float(np.percentile(exact_times, 99) * 1000),
+    }]
+    for m, ef_construct in BUILD_SETTINGS:
+        target = f"{collection_name}-bench-hnsw"
+        build_hnsw_collection(client, points, target, m, ef_construct)
+        for ef in EF_SETTINGS:
+            params = models.SearchParams(hnsw_ef=ef)
+            recalls, times = [], []
+            for vector, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = query_ids(client, target, vector, k, params)
+                times.append(time.perf_counter() - start)
+                recalls.append(len(expected & set(found)) / k)
+            rows.append({
+                "m": m,
+                "ef_construct": ef_construct,
+                "ef": ef,
+                "recall_at_k": float(np.mean(recalls)),
+                "p50_ms": float(np.percentile(times, 50) * 1000),
+                "p99_ms": float(np.percentile(times, 99) * 1000),
+            })
+        client.delete_collection(target)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HNSW settings against exact search")
+    parser.add_argument("--collection", default="html-docs")
+    parser.add_argument("--questions", default="benchmark_questions.json")
+    parser.add_argument("--sampled", type=int, default=0, help="use N sampled stored vectors instead of questions")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--output", help="write the table as JSON")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=settings.QDRANT_URL)
+    points = read_points(client, args.collection)
+    queries = load_queries(args.questions, args.collection, points, sampled=args.sampled)
+    if not queries:
+        parser.error(f"no questions for {args.collection} in {args.questions}; use --sampled N")
+
+    info = client.get_collection(args.collection)
+    size_kb = len(points) * len(points[0].vector) * 4 / 1024
+    print(f"{args.collection}: {len(points)} points, {len(queries)} queries, ~{size_kb:.0f} KB of vectors")
+    if size_kb < info.config.hnsw_config.full_scan_threshold:
+        print(
+            f"  note: below full_scan_threshold ({info.config.hnsw_config.full_scan_threshold} KB), "
+            "so Qdrant currently answers this collection with exact search"
+        )
+
+    rows = benchmark(client, args.collection, queries, points, args.k)
+    print(f"{'m':>4} {'ef_construct':>12} {'ef':>5} {'Recall@' + str(args.k):>9} {'p50':>9} {'p99':>9}")
+    for row in rows:
+        label = ("exact", "", "") if row["m"] is None else (row["m"], row["ef_construct"], row["ef"])
+        print(
+            f"{label[0]:>4} {label[1]:>12} {label[2]:>5} {row['recall_at_k']:>9.3f} "
+            f"{row['p50_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare dense-only retrieval with the BM25 fast path + hybrid retrieval.
+
+For every question in the set, both routes are timed with uncached query
+embeddings. Agreement is the share of the dense top-k the new route also
+returns. Recall@k is only reported for questions labelled with the pages
+that answer them, e.g.
+
+    {"topic": "Git", "question": "git cherry-pick",
+     "relevant_sources": ["https://git-scm.com/docs/git-cherry-pick"]}
+
+    python benchmark_lexical.py --questions benchmark_questions.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from docs_engine import get_embeddings
+from topics import load_topic
+
+
+def _recall(hits, relevant_sources):
+    """Share of the labelled sources found among the hits (None without labels)"""
+    if not relevant_sources:
+        return None
+    found = {doc.metadata.get("source") for _, doc, _ in hits}
+    return len(found & set(relevant_sources)) / len(relevant_sources)
+
+
+def _agreement(hits, dense_ids):
+    if not dense_ids:
+        return 1.0
+    return len({point_id for point_id, _, _ in hits} & dense_ids) / len(dense_ids)
+
+
+def run_question(engine, question, relevant_sources=None):
+    # Bypass the query-embedding cache so both routes pay a real round trip
+    raw_embeddings = get_embeddings().embeddings
+
+    start = time.perf_counter()
+    dense_hits = engine.dense_search(raw_embeddings.embed_query(question), engine.k)
+    dense_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = engine.lexical_fast_path(question)
+    route = "lexical"
+    if hits is None:
+        hits = engine.search(question, raw_embeddings.embed_query(question))
+        route = "hybrid" if engine.lexical_index is not None else "dense"
+    hybrid_seconds = time.perf_counter() - start
+
+    dense_ids = {point_id for point_id, _, _ in dense_hits}
+    return {
+        "question": question,
+        "route": route,
+        "dense_ms": dense_seconds * 1000,
+        "hybrid_ms": hybrid_seconds * 1000,
+        "agreement": _agreement(hits, dense_ids),
+        "dense_recall": _recall(dense_hits, relevant_sources),
+        "hybrid_recall": _recall(hits, relevant_sources),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BM25 fast path and hybrid retrieval")
+    parser.add_argument("--questions", default="benchmark_questions.json")
+    parser.add_argument("--output", help="write per-question results as JSON")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = json.load(f)
+
+    results = []
+    for item in questions:
+        engine = load_topic(item["topic"])
+        results.append(run_question(engine, item["question"], item.get("relevant_sources")))
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.2f}"
+
+    print(f"{'Route':<8} {'Dense ms':>9} {'New ms':>8} {'Agree':>6} {'Dense R':>8} {'New R':>6}  Question")
+    for r in results:
+        print(
+            f"{r['route']:<8} {r['dense_ms']:>9.1f} {r['hybrid_ms']:>8.1f} {r['agreement']:>6.2f} "
+            f"{fmt(r['dense_recall']):>8} {fmt(r['hybrid_recall']):>6}  {r['question']}"
+        )
+
+    fast = [r for r in results if r["route"] == "lexical"]
+    dense_mean = statistics.mean(r["dense_ms"] for r in results)
+    hybrid_mean = statistics.mean(r["hybrid_ms"] for r in results)
+    print(f"\nFast path taken: {len(fast)}/{len(results)} questions")
+    print(f"Mean latency: dense {dense_mean:.1f} ms, new {hybrid_mean:.1f} ms (saved {dense_mean - hybrid_mean:.1f} ms)")
+    print(f"Mean agreement with the dense top-k: {statistics.mean(r['agreement'] for r in results):.2f}")
+    labelled = [r for r in results if r["dense_recall"] is not None]
+    if labelled:
+        print(
+            f"Mean recall@k over {len(labelled)} labelled questions: "
+            f"dense {statistics.mean(r['dense_recall'] for r in labelled):.2f}, "
+            f"new {statistics.mean(r['hybrid_recall'] for r in labelled):.2f}"
+        )
+    else:
+        print("Recall@k: not measured (no question lists relevant_sources)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
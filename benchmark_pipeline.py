@@ -0,0 +1,256 @@
+"""
+Hermetic per-stage benchmark of ingestion and the question-answering path.
+
+Runs offline: deterministic fake embeddings, a stub LLM and an in-memory
+Qdrant stand in for Gemini and the Qdrant server, and local index files go to
+a temporary directory. A synthetic documentation corpus is split, embedded,
+stored and indexed, then every stage of get_response (embed, search, context
+build, prompt build, generate) is timed over a fixed set of questions. The
+BM25 fast path is switched off so the end-to-end time covers the same
+embed -> search -> generate route as the stages; the route each timed
+get_response took is recorded.
+Results are JSON, so runs can be compared:
+
+    python benchmark_pipeline.py --pages 200 --output results.json
+    python benchmark_pipeline.py --compare baseline.json results.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from qdrant_client import QdrantClient
+
+import docs_engine
+import settings
+from embedding_cache import CachedQueryEmbeddings
+from embedding_stage import embed_chunks
+from indexing import ensure_collection, incremental_index, upsert_chunks
+from lexical_index import build_lexical_index
+from numpy_index import build_numpy_index
+from structured_chunking import StructuredTextSplitter
+
+COLLECTION = "bench-docs"
+
+VOCABULARY = (
+    "element attribute commit branch merge rebase query index table join select insert "
+    "template class function pointer vector container cluster pod deployment service image "
+    "volume network request response model view middleware migration form field header "
+    "stream buffer cache thread lock transaction schema column value parameter argument "
+    "return default option config server client route handler session token user file"
+).split()
+
+FILLER = "the a of to and in is for with that this on by as are can be from or".split()
+
+STUB_ANSWER = " ".join(["The answer is based on the provided documentation."] * 20)
+
+
+def make_page(rng, index, words):
+    """Return a synthetic documentation page of roughly `words` words"""
+    lines = [f"# {rng.choice(VOCABULARY).title()} reference {index}"]
+    written = 0
+    while written < words:
+        lines.append(f"## {rng.choice(VOCABULARY).title()} {rng.choice(VOCABULARY)}")
+        for _ in range(rng.randint(2, 5)):
+            sentence = [rng.choice(VOCABULARY if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(8, 20))]
+            lines.append(" ".join(sentence).capitalize() + ".")
+            written += len(sentence)
+        if rng.random() < 0.3:
+            lines.append(f"```\n{rng.choice(VOCABULARY)}({rng.choice(VOCABULARY)}, {rng.choice(VOCABULARY)})\n```")
+    return Document(
+        page_content="\n\n".join(lines),
+        metadata={"source": f"https://bench.local/docs/page-{index}", "title": f"Page {index}"},
+    )
+
+
+def make_questions(rng, count):
+    return [
+        f"How do I use {rng.choice(VOCABULARY)} with {rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}?"
+        for _ in range(count)
+    ]
+
+
+def summarize(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": ms[len(ms) // 2],
+        "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+        "p99_ms": ms[min(len(ms) - 1, int(len(ms) * 0.99))],
+        "min_ms": ms[0],
+        "max_ms": ms[-1],
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def use_offline_clients(dimension):
+    """Point settings and the shared clients at local fakes"""
+    settings.CACHE_DIR = tempfile.mkdtemp(prefix="chai-bench-")
+    settings.ANSWER_CACHE_ENABLED = False
+    settings.LEXICAL_FAST_PATH = False
+    embeddings = DeterministicFakeEmbedding(size=dimension)
+    client = QdrantClient(":memory:")
+    # max_size=0 keeps every query embedding uncached
+    docs_engine._embeddings = CachedQueryEmbeddings(embeddings, "fake", max_size=0)
+    docs_engine._llm = FakeListChatModel(responses=[STUB_ANSWER])
+    docs_engine._qdrant_client = client
+    return client, embeddings
+
+
+def run(pages=100, words_per_page=3000, queries=200, dimension=768, backend="qdrant", seed=0):
+    rng = random.Random(seed)
+    client, embeddings = use_offline_clients(dimension)
+    text_splitter = StructuredTextSplitter(max_tokens=settings.CHUNK_TOKENS)
+
+    docs = [make_page(rng, index, words_per_page) for index in range(pages)]
+    ingest = {}
+    splits, ingest["split"] = timed(text_splitter.split_documents, docs)
+    vectors, ingest["embed"] = timed(embed_chunks, splits, embeddings, on_progress=None)
+    start = time.perf_counter()
+    ensure_collection(client, COLLECTION, dimension)
+    upsert_chunks(client, COLLECTION, splits, vectors)
+    ingest["upsert"] = time.perf_counter() - start
+    _, ingest["lexical_index"] = timed(build_lexical_index, client, COLLECTION)
+    _, ingest["numpy_index"] = timed(build_numpy_index, client, COLLECTION)
+    # Incremental indexing on a fresh collection, then a no-change re-run
+    _, ingest["incremental_first"] = timed(
+        incremental_index, client, f"{COLLECTION}-incremental", docs, text_splitter, embeddings, on_progress=None
+    )
+    _, ingest["incremental_unchanged"] = timed(
+        incremental_index, client, f"{COLLECTION}-incremental", docs, text_splitter, embeddings, on_progress=None
+    )
+
+    engine = docs_engine.DocsEngine(COLLECTION, "You are a documentation tutor.", backend=backend)
+    engine.warm()
+    llm = docs_engine.get_llm()
+    stages = {name: [] for name in ("embed", "search", "context", "prompt", "generate", "get_response")}
+    routes = {}
+    for question in make_questions(rng, queries):
+        query_vector, seconds = timed(embeddings.embed_query, question)
+        stages["embed"].append(seconds)
+        hits, seconds = timed(engine.search, question, query_vector)
+        stages["search"].append(seconds)
+        chunks = [doc for _, doc, _ in hits]
+        _, seconds = timed(engine.build_context, chunks)
+        stages["context"].append(seconds)
+        messages, seconds = timed(engine.build_messages, question, chunks)
+        stages["prompt"].append(seconds)
+        _, seconds = timed(llm.invoke, messages)
+        stages["generate"].append(seconds)
+        trace, seconds = timed(engine.get_result, question)
+        stages["get_response"].append(seconds)
+        routes[trace.route] = routes.get(trace.route, 0) + 1
+
+    return {
+        "meta": {
+            "pages": pages,
+            "words_per_page": words_per_page,
+            "chunks": len(splits),
+            "queries": queries,
+            "dimension": dimension,
+            "backend": backend,
+            "seed": seed,
+            "python": platform.python_version(),
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "ingest_seconds": ingest,
+        "routes": routes,
+        "query": {name: summarize(seconds) for name, seconds in stages.items()},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    meta = results["meta"]
+    print(f"{meta['pages']} pages, {meta['chunks']} chunks, {meta['queries']} queries, backend {meta['backend']}")
+    print("\nIngestion")
+    for name, seconds in results["ingest_seconds"].items():
+        print(f"  {name:<22} {seconds * 1000:>10.1f}ms")
+    print(f"\n{'Query stage':<14} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in results["query"].items():
+        print(
+            f"{name:<14} {stats['mean_ms']:>7.3f}ms {stats['p50_ms']:>7.3f}ms "
+            f"{stats['p95_ms']:>7.3f}ms {stats['p99_ms']:>7.3f}ms"
+        )
+    routes = ", ".join(f"{route} {count}" for route, count in results.get("routes", {}).items())
+    print(f"\nget_response routes: {routes}")
+
+
+def compare(baseline_path, current_path, tolerance=0.10):
+    """Print per-stage changes between two result files and return True if nothing regressed"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = [
+        (f"ingest {name}", baseline["ingest_seconds"][name] * 1000, seconds * 1000)
+        for name, seconds in current["ingest_seconds"].items()
+        if name in baseline["ingest_seconds"]
+    ]
+    rows += [
+        (f"query {name} p50", baseline["query"][name]["p50_ms"], stats["p50_ms"])
+        for name, stats in current["query"].items()
+        if name in baseline["query"]
+    ]
+    ok = True
+    print(f"{'Stage':<26} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, before, after in rows:
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > tolerance:
+            flag = "  ⚠️ slower"
+            ok = False
+        print(f"{name:<26} {before:>9.3f}ms {after:>9.3f}ms {change:>+7.0%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmark of ingestion and retrieval")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--words-per-page", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--backend", choices=["qdrant", "numpy"], default="qdrant")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        raise SystemExit(0 if compare(*args.compare, tolerance=args.tolerance) else 1)
+
+    results = run(args.pages, args.words_per_page, args.queries, args.dimension, args.backend, args.seed)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
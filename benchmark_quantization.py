@@ -0,0 +1,124 @@
+"""
+Report memory saved versus recall lost by quantizing a collection.
+
+The collection's points are copied into temporary collections with scalar
+(int8) and binary quantization. Stored vectors (with a little noise) are used
+as queries, so no embedding API calls are needed, and each setting's top-k is
+compared with exact full-precision search.
+
+    python benchmark_quantization.py --collection html-docs --queries 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+import settings
+from indexing import configure_quantization, ensure_collection, iter_points
+
+SETTINGS = [
+    # (quantization, rescore, oversampling)
+    ("scalar", False, 1.0),
+    ("scalar", True, 2.0),
+    ("binary", False, 1.0),
+    ("binary", True, 2.0),
+    ("binary", True, 4.0),
+]
+
+
+def vector_ram_bytes(points, dimension, quantization):
+    """Approximate RAM held by the vectors themselves (excluding the HNSW graph)"""
+    if quantization == "scalar":
+        return points * dimension
+    if quantization == "binary":
+        return points * ((dimension + 7) // 8)
+    return points * dimension * 4
+
+
+def read_points(client, collection_name):
+    return list(iter_points(client, collection_name, with_payload=False, with_vectors=True))
+
+
+def copy_collection(client, points, target, quantization, batch_size=256):
+    if client.collection_exists(target):
+        client.delete_collection(target)
+    ensure_collection(client, target, len(points[0].vector))
+    for start in range(0, len(points), batch_size):
+        client.upsert(
+            target,
+            points=[models.PointStruct(id=p.id, vector=p.vector) for p in points[start:start + batch_size]],
+        )
+    configure_quantization(client, target, quantization)
+    # Wait for the quantized segments to be built before timing searches
+    while client.get_collection(target).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def top_ids(client, collection_name, vector, k, search_params):
+    points = client.query_points(collection_name, query=vector, limit=k, search_params=search_params).points
+    return [str(point.id) for point in points]
+
+
+def benchmark(client, collection_name, queries=100, k=4, seed=0):
+    points = read_points(client, collection_name)
+    dimension = len(points[0].vector)
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(points), size=queries)
+    vectors = [
+        (np.asarray(points[row].vector) + rng.normal(0, 0.01, size=dimension)).tolist() for row in rows
+    ]
+    exact = models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))
+    truth = [set(top_ids(client, collection_name, vector, k, exact)) for vector in vectors]
+
+    baseline = vector_ram_bytes(len(points), dimension, "none")
+    reports = []
+    for quantization, rescore, oversampling in SETTINGS:
+        target = f"{collection_name}-bench-{quantization}"
+        if not reports or reports[-1]["quantization"] != quantization:
+            copy_collection(client, points, target, quantization)
+        params = models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+        )
+        recalls, times = [], []
+        for vector, expected in zip(vectors, truth):
+            start = time.perf_counter()
+            found = top_ids(client, target, vector, k, params)
+            times.append(time.perf_counter() - start)
+            recalls.append(len(expected & set(found)) / k)
+        ram = vector_ram_bytes(len(points), dimension, quantization)
+        reports.append({
+            "quantization": quantization,
+            "rescore": rescore,
+            "oversampling": oversampling,
+            "vector_ram_mb": ram / 2**20,
+            "memory_saved": 1 - ram / baseline,
+            "recall_at_k": float(np.mean(recalls)),
+            "p50_ms": float(np.percentile(times, 50) * 1000),
+        })
+    for quantization in {quantization for quantization, _, _ in SETTINGS}:
+        client.delete_collection(f"{collection_name}-bench-{quantization}")
+    return len(points), dimension, baseline / 2**20, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory saved vs recall lost by quantization")
+    parser.add_argument("--collection", default="html-docs")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=settings.QDRANT_URL)
+    count, dimension, baseline_mb, reports = benchmark(client, args.collection, args.queries, args.k)
+    print(f"{args.collection}: {count} points x {dimension} dims, {baseline_mb:.1f} MB of float32 vectors in RAM")
+    print(f"{'Quantization':<13} {'Rescore':>7} {'Oversample':>10} {'RAM MB':>7} {'Saved':>6} {'Recall@' + str(args.k):>9} {'p50':>8}")
+    for r in reports:
+        print(
+            f"{r['quantization']:<13} {str(r['rescore']):>7} {r['oversampling']:>10.1f} {r['vector_ram_mb']:>7.1f} "
+            f"{r['memory_saved']:>6.0%} {r['recall_at_k']:>9.3f} {r['p50_ms']:>6.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
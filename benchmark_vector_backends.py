@@ -0,0 +1,76 @@
+"""
+Compare Qdrant and the in-process NumPy index on query latency.
+
+Query vectors are taken from the collection itself (with a little noise), so
+no embedding API calls are needed. Requires the NumPy index to be built
+(setup_collections.py or `snapshot.py import --local-only`).
+
+    python benchmark_vector_backends.py --collection html-docs --queries 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+import settings
+from numpy_index import NumpyVectorIndex, numpy_index_dir
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+
+def benchmark(collection_name, queries=200, k=4, seed=0):
+    index = NumpyVectorIndex.load(numpy_index_dir(collection_name), collection_name)
+    client = QdrantClient(url=settings.QDRANT_URL)
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(index.ids), size=queries)
+    vectors = np.asarray(index.matrix[rows]) + rng.normal(0, 0.01, size=(queries, index.matrix.shape[1]))
+
+    qdrant_times, numpy_times, agreement = [], [], []
+    for vector in vectors.astype(np.float32):
+        start = time.perf_counter()
+        points = client.query_points(collection_name, query=vector.tolist(), limit=k).points
+        qdrant_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hits = index.search(vector, k)
+        numpy_times.append(time.perf_counter() - start)
+
+        qdrant_ids = {str(point.id) for point in points}
+        agreement.append(len(qdrant_ids & {point_id for point_id, _, _ in hits}) / k)
+
+    return {
+        "collection": collection_name,
+        "points": len(index.ids),
+        "qdrant_p50_ms": percentile(qdrant_times, 50),
+        "qdrant_p99_ms": percentile(qdrant_times, 99),
+        "numpy_p50_ms": percentile(numpy_times, 50),
+        "numpy_p99_ms": percentile(numpy_times, 99),
+        "top_k_agreement": float(np.mean(agreement)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant against the in-process NumPy index")
+    parser.add_argument("--collection", action="append", help="collection(s) to benchmark (default: all six)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    collections = args.collection or [
+        "html-docs", "git-docs", "sql-docs", "cpp-docs", "django-docs", "devops-docs"
+    ]
+    print(f"{'Collection':<14} {'Points':>7} {'Qdrant p50':>11} {'p99':>8} {'NumPy p50':>10} {'p99':>8} {'Agree':>6}")
+    for collection_name in collections:
+        r = benchmark(collection_name, args.queries, args.k)
+        print(
+            f"{r['collection']:<14} {r['points']:>7} {r['qdrant_p50_ms']:>9.2f}ms {r['qdrant_p99_ms']:>6.2f}ms "
+            f"{r['numpy_p50_ms']:>8.2f}ms {r['numpy_p99_ms']:>6.2f}ms {r['top_k_agreement']:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
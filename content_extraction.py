@@ -0,0 +1,191 @@
+"""
+Main-content extraction for documentation pages.
+
+WebBaseLoader keeps everything on a page: navigation menus, sidebars, cookie
+banners and footers. Before chunking, the article region is selected with a
+per-site CSS selector, or with a readability-style heuristic (<main>,
+<article>, else the block with the most non-link text) for other sites.
+Boilerplate inside it is removed, and headings and code blocks are written
+as Markdown-style "## Heading {#anchor}" lines and ``` fences so the
+structure-aware chunker can split on them.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+from bs4 import NavigableString
+
+from request_trace import estimate_tokens
+
+# Bump when a change alters the extracted text, so incremental runs re-chunk every page
+EXTRACTION_VERSION = 2
+
+# Host -> CSS selectors for the main content, tried in order
+SITE_SELECTORS = {
+    "developer.mozilla.org": ["main#content .main-page-content", "main#content", "main"],
+    "www.w3schools.com": ["#main"],
+    "html.spec.whatwg.org": ["body"],
+    "git-scm.com": ["#main", "#content"],
+    "docs.github.com": ["main article", "main"],
+    "www.atlassian.com": ["main", "article"],
+    "dev.mysql.com": ["#docs-body", "#docs-main", "main"],
+    "www.postgresql.org": ["#docContent", "#pgContentWrap"],
+    "en.cppreference.com": ["#mw-content-text", "#content"],
+    "www.learncpp.com": ["article .entry-content", "article"],
+    "isocpp.org": ["#content", "main"],
+    "docs.djangoproject.com": ["#docs-content", "article", "main"],
+    "www.djangoproject.com": ["main", "#content"],
+    "tutorial.djangogirls.org": [".page-inner section", ".book-body", "main"],
+    "docs.docker.com": ["main article", "article", "main"],
+    "kubernetes.io": [".td-content", "main"],
+    "docs.aws.amazon.com": ["#main-col-body", "#main-content", "main"],
+}
+
+# Elements that are never article content. <header> is not listed: an
+# article's own header holds its title; only page headers are removed.
+REMOVE_TAGS = ["script", "style", "noscript", "template", "nav", "footer", "aside", "form", "iframe", "svg",
+               "button", "dialog"]
+REMOVE_ROLES = ["navigation", "banner", "contentinfo", "complementary", "search", "dialog", "alert"]
+
+# id/class names of boilerplate blocks
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|consent|gdpr|breadcrumb|sidebar|sidenav|footer|navbar|masthead|advert|newsletter|subscribe|"
+    r"feedback|skip-link|table-of-contents|edit-page|"
+    r"(?<![a-z0-9])(?:toc|nav|menu|ads?|banner|promo|share|social|related|rating|comments?)(?![a-z0-9])",
+    re.IGNORECASE,
+)
+
+BLOCK_TAGS = ["p", "div", "section", "article", "li", "dt", "dd", "tr", "table", "ul", "ol", "dl", "blockquote",
+              "figure", "figcaption", "br", "hr"]
+
+
+def _is_article(tag):
+    return tag.name in ("main", "article") or tag.get("role") == "main"
+
+
+def _is_boilerplate(tag):
+    # A <main>/<article> is a candidate root, never boilerplate, whatever its class names
+    if _is_article(tag):
+        return False
+    names = " ".join([tag.get("id") or ""] + list(tag.get("class") or []))
+    return bool(BOILERPLATE_PATTERN.search(names))
+
+
+def _decompose_all(tags):
+    for tag in tags:
+        # Skip tags already removed along with an enclosing one
+        if not tag.decomposed:
+            tag.decompose()
+
+
+def _page_headers(root, whole_page):
+    """<header> elements outside any article: only when the root is the whole page"""
+    if not whole_page:
+        return []
+    return [header for header in root.find_all("header") if header.find_parent(_is_article) is None]
+
+
+def _remove_boilerplate(root, whole_page=False):
+    _decompose_all(_page_headers(root, whole_page))
+    _decompose_all(root.find_all(REMOVE_TAGS))
+    _decompose_all(root.find_all(attrs={"role": REMOVE_ROLES}))
+    _decompose_all(root.find_all(attrs={"aria-hidden": "true"}))
+    _decompose_all(root.find_all(_is_boilerplate))
+
+
+def _text_score(tag):
+    """Non-link text length of a block, the readability signal"""
+    text_length = len(tag.get_text(" ", strip=True))
+    if not text_length:
+        return 0
+    link_length = sum(len(a.get_text(" ", strip=True)) for a in tag.find_all("a"))
+    return text_length * (1 - link_length / text_length)
+
+
+def _heuristic_root(soup):
+    for selector in ("main", "article", "[role=main]"):
+        candidates = soup.select(selector)
+        if candidates:
+            return max(candidates, key=_text_score), "heuristic"
+    blocks = soup.find_all(["div", "section"])
+    if blocks:
+        best = max(blocks, key=lambda tag: _text_score(tag) - 0.1 * len(tag.find_all(["div", "section"])))
+        if _text_score(best) > 0.5 * _text_score(soup.body or soup):
+            return best, "heuristic"
+    return soup.body or soup, "none"
+
+
+def select_main_content(soup, url):
+    """Return (main content element, how it was chosen) for a page"""
+    host = urlsplit(url).netloc.lower()
+    for selector in SITE_SELECTORS.get(host, []):
+        found = soup.select_one(selector)
+        if found is not None and found.get_text(strip=True):
+            return found, "site"
+    return _heuristic_root(soup)
+
+
+def _heading_anchor(heading):
+    """The fragment id linking to a heading, if the page gives it one"""
+    if heading.get("id"):
+        return heading["id"]
+    named = heading.find(attrs={"id": True}) or heading.find("a", attrs={"name": True})
+    if named is not None:
+        return named.get("id") or named.get("name")
+    parent = heading.parent
+    if parent is not None and parent.name == "section" and parent.get("id"):
+        return parent["id"]
+    return None
+
+
+def _to_text(root):
+    """Flatten an element to text, keeping headings and code blocks visible"""
+    for pre in root.find_all("pre"):
+        pre.replace_with(NavigableString(f"\n\n```\n{pre.get_text().strip(chr(10))}\n```\n\n"))
+    for heading in root.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        level = int(heading.name[1])
+        title = " ".join(heading.get_text(" ", strip=True).split())
+        anchor = _heading_anchor(heading)
+        suffix = f" {{#{anchor}}}" if anchor else ""
+        heading.replace_with(NavigableString(f"\n\n{'#' * level} {title}{suffix}\n\n"))
+    for block in root.find_all(BLOCK_TAGS):
+        block.insert_after(NavigableString("\n"))
+    text = root.get_text()
+    text = re.sub(r"[ \t\r\f\v]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def extract_main_content(soup, url):
+    """Return (main text, how the region was chosen: "site", "heuristic" or "none").
+
+    The soup is modified in place.
+    """
+    root, method = select_main_content(soup, url)
+    _remove_boilerplate(root, whole_page=method == "none")
+    return _to_text(root), method
+
+
+def extraction_report(pages, text_splitter):
+    """Compare full-page text with extracted text for pages parsed by html_to_document.
+
+    `pages` are the rows html_to_document appended to its `report` list
+    (url, method, full_text, main_text). Returns a dict of totals (pages,
+    chunks and approximate tokens before and after) and one row per page.
+    """
+    rows = []
+    for page in pages:
+        rows.append({
+            "url": page["url"],
+            "method": page["method"],
+            "chunks_before": len(text_splitter.split_text(page["full_text"])),
+            "chunks_after": len(text_splitter.split_text(page["main_text"])),
+            "tokens_before": estimate_tokens(page["full_text"]),
+            "tokens_after": estimate_tokens(page["main_text"]),
+        })
+    totals = {
+        key: sum(row[key] for row in rows)
+        for key in ("chunks_before", "chunks_after", "tokens_before", "tokens_after")
+    }
+    totals["pages"] = len(rows)
+    return totals, rows
@@ -0,0 +1,80 @@
+"""
+Prompt context assembly under a token budget.
+
+Retrieved chunks are taken in relevance order until the budget is spent,
+then grouped by source (sources in order of their best chunk) and put back in
+page order. Chunks are split with an overlap, so when two neighbours of the
+same page repeat the same span it is only kept once, and exact or contained
+duplicates are dropped.
+"""
+
+from request_trace import estimate_tokens
+
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+MIN_OVERLAP = 20
+
+
+def overlap_length(left, right, max_overlap=1000):
+    """Length of the longest suffix of `left` that is also a prefix of `right`"""
+    tail = left[-max_overlap:]
+    probe = right[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return 0
+    position = tail.find(probe)
+    while position != -1:
+        if right.startswith(tail[position:]):
+            return len(tail) - position
+        position = tail.find(probe, position + 1)
+    return 0
+
+
+def _select(docs, token_budget):
+    """Most relevant chunks that fit in the budget, each with its relevance rank"""
+    selected, used = [], 0
+    for rank, doc in enumerate(docs):
+        text = doc.page_content.strip()
+        if not text or any(text in other.page_content for _, other in selected):
+            continue
+        cost = estimate_tokens(text)
+        if token_budget and used + cost > token_budget:
+            if selected:
+                continue
+            # Always keep (the start of) the best chunk
+            text = text[:token_budget * 4]
+            doc = doc.model_copy(update={"page_content": text})
+            cost = estimate_tokens(text)
+        selected.append((rank, doc))
+        used += cost
+    return selected
+
+
+def _merge(texts):
+    """Join one source's chunks (in page order), dropping repeated overlaps"""
+    merged = texts[0]
+    for text in texts[1:]:
+        overlap = overlap_length(merged, text)
+        if overlap:
+            merged += text[overlap:]
+        else:
+            merged += "\n\n" + text
+    return merged
+
+
+def build_context(docs, token_budget=0):
+    """Return the context string for Documents given in relevance order.
+
+    `token_budget` is an approximate limit on the context's tokens (0 means
+    no limit).
+    """
+    groups = {}
+    for rank, doc in _select(docs, token_budget):
+        source = doc.metadata.get("source") or ""
+        groups.setdefault(source, []).append((doc.metadata.get("start_index", rank), rank, doc))
+
+    sections = []
+    for source, chunks in groups.items():
+        chunks.sort(key=lambda chunk: (chunk[0], chunk[1]))
+        title = chunks[0][2].metadata.get("title")
+        header = f"Source: {title} ({source})" if title and source else f"Source: {source or title or 'unknown'}"
+        sections.append(header + "\n" + _merge([doc.page_content.strip() for _, _, doc in chunks]))
+    return "\n\n".join(sections)
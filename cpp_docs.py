@@ -1,33 +1,4 @@
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-import os
-from dotenv import load_dotenv
-import json
-
-# Set Google API key as environment variable
-load_dotenv()
-
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-os.environ["GOOGLE_API_KEY"] = gemini_api_key
-
-# Initialize the LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", temperature=0)
-
-# Initialize embeddings
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004"
-)
-
-# Initialize retriever
-retriever = QdrantVectorStore.from_existing_collection(
-    url="http://localhost:6333",
-    collection_name="cpp-docs",
-    embedding=embeddings
-)
+from docs_engine import DocsEngine
 
 system_prompt = """
 You are a knowledgeable C++ tutor from Chai and Code.
@@ -56,27 +27,16 @@ Source: Introduction to C++ (https://docs.chaicode.com/youtube/chai-aur-cpp/intr
 IMPORTANT: Your response should be clean and professional. Do not include any metadata or debug information.
 """
 
+engine = DocsEngine("cpp-docs", system_prompt)
+
 def get_response(user_input):
-    # Retrieve relevant documents
-    docs = retriever.similarity_search(user_input)
-    
-    # Extract content
-    context = ""
-    
-    for doc in docs:
-        content = doc.page_content
-        context += content + "\n\n"
-    
-    # Create messages for the LLM
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Context:\n{context}\n\nUser Question: {user_input}"}
-    ]
-    
-    # Get response from LLM
-    response = llm.invoke(messages)
-    
-    return response.content
+    return engine.get_response(user_input)
+
+def stream_response(user_input, trace=None):
+    return engine.stream_response(user_input, trace=trace)
+
+async def aget_response(user_input):
+    return await engine.aget_response(user_input)
 
 if __name__ == "__main__":
     # Print header
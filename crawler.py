@@ -0,0 +1,282 @@
+"""
+Bounded crawling of documentation sites for ingestion.
+
+Starting from a collection's root URLs (and, optionally, the URLs listed in
+each host's sitemap.xml), pages are fetched concurrently and their links
+followed breadth-first, up to `max_depth` links away from a root and at most
+`max_pages` pages in total. Only URLs matching the `allow` patterns are
+followed (by default, URLs under one of the roots, including where a root
+redirects to) and never ones matching `deny` or disallowed by robots.txt.
+
+URLs are de-duplicated by canonical form (page_cache.canonical_url), and a
+fetched page whose redirect target or <link rel="canonical"> was already
+crawled is dropped as a duplicate. Fetching shares page_fetcher's connection
+pool, per-host connection cap and delay, retries and conditional GETs.
+"""
+
+import asyncio
+import gzip
+import re
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
+from langchain_community.document_loaders.web_base import default_header_template
+
+import settings
+from page_cache import PageCache, canonical_url
+from page_fetcher import _fetch_one, _HostThrottle, html_to_document
+
+# Links to files that are never documentation pages
+SKIP_EXTENSIONS = re.compile(
+    r"\.(?:png|jpe?g|gif|svg|webp|ico|css|js|json|xml|txt|pdf|zip|gz|tgz|tar|bz2|xz|mp4|webm|mp3|woff2?|ttf|eot)$",
+    re.IGNORECASE,
+)
+HTML_TYPES = {"text/html", "application/xhtml+xml"}
+
+# Sitemap files (index and leaf) read per host
+MAX_SITEMAPS = 20
+
+
+class CrawlScope:
+    """Decides which URLs a crawl may fetch"""
+
+    def __init__(self, seeds, allow=None, deny=None):
+        self.prefixes = [canonical_url(seed) for seed in seeds]
+        self.allow = [re.compile(pattern) for pattern in allow or []]
+        self.deny = [re.compile(pattern) for pattern in deny or []]
+        self.robots = {}
+
+    def add_prefix(self, url):
+        """Also allow URLs under `url` (e.g. where a root redirected to)"""
+        url = canonical_url(url)
+        if url not in self.prefixes:
+            self.prefixes.append(url)
+
+    def allows(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or SKIP_EXTENSIONS.search(parts.path):
+            return False
+        if any(pattern.search(url) for pattern in self.deny):
+            return False
+        robots = self.robots.get(parts.netloc)
+        if robots is not None and not robots.can_fetch(default_header_template["User-Agent"], url):
+            return False
+        if self.allow:
+            return any(pattern.search(url) for pattern in self.allow)
+        return any(url.startswith(prefix) for prefix in self.prefixes)
+
+
+def extract_links(html, base_url, parser="html.parser"):
+    """Return (canonical link URLs, the page's declared canonical URL or None)"""
+    soup = BeautifulSoup(html, parser, parse_only=SoupStrainer(["a", "link", "base"]))
+    base = soup.find("base", href=True)
+    base_url = urljoin(base_url, base["href"]) if base else base_url
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        href = anchor["href"].strip()
+        if not href or href.startswith(("#", "mailto:", "javascript:", "tel:")):
+            continue
+        links.append(canonical_url(urljoin(base_url, href)))
+    declared = None
+    for link in soup.find_all("link", href=True):
+        if "canonical" in (link.get("rel") or []):
+            declared = canonical_url(urljoin(base_url, link["href"]))
+            break
+    return links, declared
+
+
+def parse_sitemap(text):
+    """Return (page URLs, child sitemap URLs) from a sitemap or sitemap index"""
+    try:
+        root = ET.fromstring(text.strip())
+    except ET.ParseError:
+        return [], []
+    locations = [
+        element.text.strip() for element in root.iter() if element.tag.endswith("loc") and element.text
+    ]
+    if root.tag.endswith("sitemapindex"):
+        return [], locations
+    return locations, []
+
+
+async def _get_text(session, url):
+    """GET a small auxiliary file (robots.txt, sitemaps), or None on any failure"""
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                return None
+            body = await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return body.decode("utf-8", errors="replace")
+
+
+async def _read_host(session, throttle, scope, host_url, use_sitemaps):
+    """Load a host's robots.txt into the scope and return the URLs in its sitemaps"""
+    await throttle.wait(host_url)
+    robots_text = await _get_text(session, urljoin(host_url, "/robots.txt"))
+    sitemaps = []
+    if robots_text is not None:
+        robots = RobotFileParser()
+        robots.parse(robots_text.splitlines())
+        scope.robots[urlsplit(host_url).netloc] = robots
+        sitemaps = list(robots.site_maps() or [])
+    if not use_sitemaps:
+        return []
+
+    pending = sitemaps or [urljoin(host_url, "/sitemap.xml")]
+    seen, urls = set(), []
+    while pending and len(seen) < MAX_SITEMAPS:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        await throttle.wait(sitemap_url)
+        text = await _get_text(session, sitemap_url)
+        if text is None:
+            continue
+        pages, children = parse_sitemap(text)
+        urls.extend(canonical_url(url) for url in pages)
+        pending.extend(children)
+    return urls
+
+
+async def crawl(
+    seeds,
+    allow=None,
+    deny=None,
+    max_depth=settings.CRAWL_MAX_DEPTH,
+    max_pages=settings.CRAWL_MAX_PAGES,
+    sitemaps=settings.CRAWL_SITEMAPS,
+    max_connections=settings.FETCH_MAX_CONNECTIONS,
+    per_host=settings.FETCH_PER_HOST,
+    delay=settings.FETCH_DELAY,
+    retries=settings.FETCH_RETRIES,
+    backoff=settings.FETCH_BACKOFF,
+    timeout=settings.FETCH_TIMEOUT,
+    cache=None,
+):
+    """Crawl from `seeds` and return (fetch results, crawl stats).
+
+    Results have page_fetcher's shape plus the page's "depth". Sitemap URLs
+    count as one link away from the roots. Duplicates and non-HTML
+    responses are left out of the results and only counted in the stats.
+    """
+    started = time.perf_counter()
+    scope = CrawlScope(seeds, allow, deny)
+    stats = {
+        "pages": 0,
+        "failed": 0,
+        "duplicates": 0,
+        "non_html": 0,
+        "sitemap_urls": 0,
+        "depth": 0,
+        "seconds": 0.0,
+    }
+    results = []
+    seen = set()  # canonical URLs already queued or known to be duplicates
+    crawled = set()  # canonical URLs of pages kept, incl. their redirect targets and declared canonicals
+    queue = asyncio.PriorityQueue()
+    order = 0
+
+    def enqueue(url, depth):
+        nonlocal order
+        # Roots are always fetched; the scope decides which of their links are
+        if url in seen or order >= max_pages or (depth and not scope.allows(url)):
+            return
+        seen.add(url)
+        order += 1
+        queue.put_nowait((depth, order, url))
+
+    connector = aiohttp.TCPConnector(limit=max_connections, limit_per_host=per_host)
+    throttle = _HostThrottle(delay)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=default_header_template,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+        hosts = {f"{urlsplit(url).scheme}://{urlsplit(url).netloc}/" for url in scope.prefixes}
+        sitemap_urls = await asyncio.gather(
+            *(_read_host(session, throttle, scope, host, sitemaps) for host in sorted(hosts))
+        )
+        sitemap_urls = [url for urls in sitemap_urls for url in urls]
+        for seed in scope.prefixes:
+            enqueue(seed, 0)
+
+        def enqueue_sitemap_urls():
+            # Offered again after every root, since a redirect may widen the scope
+            queued = len(seen)
+            for url in sitemap_urls:
+                enqueue(url, 1)
+            stats["sitemap_urls"] += len(seen) - queued
+
+        async def worker():
+            while True:
+                depth, _, url = await queue.get()
+                try:
+                    result = await _fetch_one(session, throttle, cache, url, retries, backoff)
+                    handle(result, depth)
+                finally:
+                    queue.task_done()
+
+        def handle(result, depth):
+            url = result["url"]
+            if result["html"] is None:
+                stats["failed"] += 1
+                result["depth"] = depth
+                results.append(result)
+                return
+            content_type = result["content_type"]
+            if not result["not_modified"] and content_type and content_type not in HTML_TYPES:
+                stats["non_html"] += 1
+                return
+            final_url = canonical_url(result["final_url"])
+            links, declared = extract_links(result["html"], result["final_url"])
+            aliases = {final_url, declared} - {None, url}
+            if url in crawled or aliases & crawled:
+                stats["duplicates"] += 1
+                return
+            if depth == 0:
+                if final_url != url:
+                    scope.add_prefix(final_url)
+                enqueue_sitemap_urls()
+            crawled.add(url)
+            crawled.update(aliases)
+            seen.update(aliases)
+            result["depth"] = depth
+            results.append(result)
+            stats["pages"] += 1
+            stats["depth"] = max(stats["depth"], depth)
+            if depth < max_depth:
+                for link in links:
+                    enqueue(link, depth + 1)
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, max_connections))]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    stats["seconds"] = time.perf_counter() - started
+    return results, stats
+
+
+def crawl_documents(seeds, skip_unchanged=False, use_cache=True, report=None, **options):
+    """Crawl from `seeds` and return (documents, per-URL fetch results, crawl stats).
+
+    Takes crawl()'s options; `skip_unchanged` and `report` work as in load_documents.
+    """
+    cache = PageCache() if use_cache else None
+    results, stats = asyncio.run(crawl(seeds, cache=cache, **options))
+    docs = [
+        html_to_document(r["url"], r["html"], report=report)
+        for r in results
+        if r["html"] is not None and not (skip_unchanged and r["not_modified"])
+    ]
+    return docs, results, stats
@@ -0,0 +1,118 @@
+"""
+Near-duplicate chunk removal between splitting and embedding.
+
+The documentation sources mirror each other (MDN and w3schools, the MySQL
+and PostgreSQL manuals), and pages repeat navigation, footers and
+boilerplate samples, so many chunks are near-copies. Each chunk gets a
+MinHash signature over its word shingles. Locality-sensitive hashing (bands
+of the signature) finds candidate pairs, which are kept as duplicates when
+their estimated Jaccard similarity reaches the threshold. The first chunk of
+each group is kept and records the other sources in its metadata, and the
+rest are never embedded.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+# Hashes are reduced modulo a Mersenne prime so a * x + b fits in 64 bits
+_PRIME = (1 << 31) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingle_hashes(text, shingle_size=5):
+    """32-bit hashes of the word n-grams of a text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(shingles)), dtype=np.uint64)
+
+
+class MinHasher:
+    """MinHash signatures from `num_perm` seeded universal hash functions"""
+
+    def __init__(self, num_perm=64, shingle_size=5, seed=1):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = shingle_hashes(text, self.shingle_size) % _PRIME
+        return ((self.a * hashes[None, :] + self.b) % _PRIME).min(axis=1)
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def find_duplicates(texts, threshold=0.85, num_perm=64, bands=16, shingle_size=5):
+    """Return {duplicate index: index of the kept text} for near-identical texts"""
+    if len(texts) < 2:
+        return {}
+    hasher = MinHasher(num_perm, shingle_size)
+    signatures = np.stack([hasher.signature(text) for text in texts])
+    rows = num_perm // bands
+
+    parents = list(range(len(texts)))
+    for band in range(bands):
+        buckets = {}
+        for i, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            for other in members[1:]:
+                first, second = _find(parents, members[0]), _find(parents, other)
+                if first == second:
+                    continue
+                similarity = np.mean(signatures[members[0]] == signatures[other])
+                if similarity >= threshold:
+                    # The earlier chunk stays the representative
+                    parents[max(first, second)] = min(first, second)
+
+    return {i: _find(parents, i) for i in range(len(texts)) if _find(parents, i) != i}
+
+
+def deduplicate_chunks(chunks, ids=None, threshold=0.85, num_perm=64, bands=16, shingle_size=5):
+    """Drop near-duplicate chunks and return (chunks, ids, stats).
+
+    Kept chunks list the other sources their duplicates came from under
+    metadata["duplicate_sources"]. `ids`, if given, are filtered alongside.
+    """
+    duplicates = find_duplicates(
+        [chunk.page_content for chunk in chunks], threshold, num_perm, bands, shingle_size
+    )
+    for index, kept in duplicates.items():
+        source = chunks[index].metadata.get("source")
+        kept_metadata = chunks[kept].metadata
+        if source and source != kept_metadata.get("source"):
+            sources = kept_metadata.setdefault("duplicate_sources", [])
+            if source not in sources:
+                sources.append(source)
+
+    kept_chunks = [chunk for i, chunk in enumerate(chunks) if i not in duplicates]
+    kept_ids = [point_id for i, point_id in enumerate(ids) if i not in duplicates] if ids is not None else None
+    cross_source = sum(
+        1 for index, kept in duplicates.items()
+        if chunks[index].metadata.get("source") != chunks[kept].metadata.get("source")
+    )
+    stats = {
+        "chunks_in": len(chunks),
+        "chunks_out": len(kept_chunks),
+        "duplicates": len(duplicates),
+        "cross_source_duplicates": cross_source,
+        "groups": len(set(duplicates.values())),
+    }
+    return kept_chunks, kept_ids, stats
+
+
+def embedding_savings(stats, batch_size):
+    """Embedding API calls and stored vectors avoided by deduplication"""
+    calls_before = -(-stats["chunks_in"] // batch_size)
+    calls_after = -(-stats["chunks_out"] // batch_size)
+    return {"embedding_calls_saved": calls_before - calls_after, "vectors_saved": stats["duplicates"]}
@@ -0,0 +1,566 @@
+"""
+Shared retrieval engine for all documentation topics.
+
+The topic modules (html_docs.py, git_docs.py, ...) only differ by collection
+name and system prompt. Each of them now wraps a DocsEngine, and all engines
+in a process share one pooled Qdrant client, one embeddings client and one
+LLM client instead of opening their own.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai._common import GoogleGenerativeAIError, get_client_info
+from langchain_google_genai._genai_extension import build_generative_async_service
+from langchain_qdrant import QdrantVectorStore
+
+import metrics
+import settings
+from answer_cache import SemanticAnswerCache
+from context_builder import build_context
+from embedding_cache import CachedQueryEmbeddings
+from index_state import get_index_version
+from lexical_index import BM25Index, lexical_index_path, reciprocal_rank_fusion
+from mmr import maximal_marginal_relevance
+from numpy_index import NumpyVectorIndex, numpy_index_dir
+from request_trace import RequestTrace
+
+_clients_lock = threading.Lock()
+_qdrant_client = None
+_async_qdrant_clients = weakref.WeakKeyDictionary()
+_async_embedding_clients = weakref.WeakKeyDictionary()
+_embeddings = None
+_llm = None
+
+
+def get_qdrant_client():
+    """Return the process-wide Qdrant client (keep-alive HTTP connection pool)"""
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _clients_lock:
+            if _qdrant_client is None:
+                _qdrant_client = QdrantClient(
+                    url=settings.QDRANT_URL,
+                    timeout=settings.QDRANT_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_connections=settings.QDRANT_POOL_SIZE,
+                        max_keepalive_connections=settings.QDRANT_POOL_SIZE,
+                    ),
+                )
+    return _qdrant_client
+
+
+def get_async_qdrant_client():
+    """Return the async Qdrant client for the running event loop.
+
+    Its connection pool belongs to one loop, so each loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_qdrant_clients.get(loop)
+    if client is None:
+        client = AsyncQdrantClient(
+            url=settings.QDRANT_URL,
+            timeout=settings.QDRANT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.QDRANT_POOL_SIZE,
+                max_keepalive_connections=settings.QDRANT_POOL_SIZE,
+            ),
+        )
+        _async_qdrant_clients[loop] = client
+    return client
+
+
+class GeminiEmbeddings(GoogleGenerativeAIEmbeddings):
+    """GoogleGenerativeAIEmbeddings with a native async embed_query.
+
+    The base class's aembed_query runs embed_query in a worker thread, which
+    keeps calling the API after a timeout or cancellation. This one awaits
+    Gemini's async client, so cancelling the awaiting task cancels the call.
+    """
+
+    def _async_client(self):
+        # Like AsyncQdrantClient, the gRPC channel belongs to one event loop
+        loop = asyncio.get_running_loop()
+        client = _async_embedding_clients.get(loop)
+        if client is None:
+            api_key = self.google_api_key.get_secret_value() if self.google_api_key else None
+            client = build_generative_async_service(
+                credentials=self.credentials,
+                api_key=api_key,
+                client_info=get_client_info("GoogleGenerativeAIEmbeddings"),
+                client_options=self.client_options,
+                transport=self.transport,
+            )
+            _async_embedding_clients[loop] = client
+        return client
+
+    async def aembed_query(self, text, task_type=None, title=None, output_dimensionality=None):
+        try:
+            request = self._prepare_request(
+                text=text,
+                task_type=self.task_type or task_type or "RETRIEVAL_QUERY",
+                title=title,
+                output_dimensionality=output_dimensionality,
+            )
+            result = await self._async_client().embed_content(request)
+        except Exception as e:
+            raise GoogleGenerativeAIError(f"Error embedding content: {e}") from e
+        return list(result.embedding.values)
+
+
+def get_embeddings():
+    """Return the process-wide Gemini embeddings client, with query caching"""
+    global _embeddings
+    if _embeddings is None:
+        with _clients_lock:
+            if _embeddings is None:
+                disk_path = None
+                if settings.QUERY_CACHE_DISK:
+                    disk_path = os.path.join(settings.CACHE_DIR, "query_embeddings.sqlite")
+                _embeddings = CachedQueryEmbeddings(
+                    GeminiEmbeddings(model=settings.EMBEDDING_MODEL),
+                    model_name=settings.EMBEDDING_MODEL,
+                    max_size=settings.QUERY_CACHE_SIZE,
+                    disk_path=disk_path,
+                )
+    return _embeddings
+
+
+def get_llm():
+    """Return the process-wide Gemini chat client"""
+    global _llm
+    if _llm is None:
+        with _clients_lock:
+            if _llm is None:
+                _llm = ChatGoogleGenerativeAI(model=settings.LLM_MODEL, temperature=0)
+    return _llm
+
+
+class DocsEngine:
+    """Answers questions for one topic from its Qdrant collection"""
+
+    def __init__(
+        self, collection_name, system_prompt, k=4, backend=None, oversampling=None, rescore=None, hnsw_ef=None,
+        retrieval=None, mmr_lambda=None, mmr_fetch_k=None,
+    ):
+        self.collection_name = collection_name
+        self.system_prompt = system_prompt
+        self.k = k
+        # Quantized collections: candidates fetched per result, and whether to rescore with the originals
+        self.oversampling = settings.SEARCH_OVERSAMPLING if oversampling is None else oversampling
+        self.rescore = settings.SEARCH_RESCORE if rescore is None else rescore
+        # HNSW search width per query (None uses the collection's ef_construct)
+        self.hnsw_ef = settings.SEARCH_HNSW_EF if hnsw_ef is None else hnsw_ef
+        # "similarity", or "mmr" to pick diverse chunks from mmr_fetch_k candidates
+        self.retrieval = retrieval or settings.RETRIEVAL_MODES.get(collection_name, settings.DEFAULT_RETRIEVAL_MODE)
+        self.mmr_lambda = settings.MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+        self.mmr_fetch_k = settings.MMR_FETCH_K if mmr_fetch_k is None else mmr_fetch_k
+        # "qdrant" or "numpy" (in-process search over a local copy of the vectors)
+        self.backend = backend or settings.VECTOR_BACKENDS.get(collection_name, settings.DEFAULT_VECTOR_BACKEND)
+        self._retriever = None
+        self._lexical_index = None
+        self._numpy_index = None
+        self._local_version = None
+        self._warmed = False
+        self._lock = threading.Lock()
+        self.answer_cache = None
+        if settings.ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                collection_name,
+                threshold=settings.ANSWER_CACHE_THRESHOLD,
+                ttl=settings.ANSWER_CACHE_TTL,
+                max_size=settings.ANSWER_CACHE_SIZE,
+            )
+
+    @property
+    def retriever(self):
+        # Connect on first use so importing a topic module stays cheap
+        if self._retriever is None:
+            with self._lock:
+                if self._retriever is None:
+                    self._retriever = QdrantVectorStore(
+                        client=get_qdrant_client(),
+                        collection_name=self.collection_name,
+                        embedding=get_embeddings(),
+                    )
+        return self._retriever
+
+    def _refresh_local_indexes(self):
+        # (Re)load the on-disk indexes when the collection has been re-indexed
+        version = get_index_version(self.collection_name)
+        if version == self._local_version:
+            return
+        with self._lock:
+            if version == self._local_version:
+                return
+            path = lexical_index_path(self.collection_name)
+            self._lexical_index = None
+            if settings.LEXICAL_ENABLED and os.path.exists(path):
+                self._lexical_index = BM25Index.load(path)
+            directory = numpy_index_dir(self.collection_name)
+            self._numpy_index = None
+            if self.backend == "numpy" and os.path.exists(os.path.join(directory, "vectors.npy")):
+                self._numpy_index = NumpyVectorIndex.load(directory, self.collection_name)
+            self._local_version = version
+
+    @property
+    def lexical_index(self):
+        """The collection's BM25 index (None if not built or disabled)"""
+        self._refresh_local_indexes()
+        return self._lexical_index
+
+    @property
+    def numpy_index(self):
+        """The in-process vector index (None unless the numpy backend is selected and built)"""
+        self._refresh_local_indexes()
+        return self._numpy_index
+
+    def warm(self):
+        """Load local indexes and connect to the collection ahead of the first question"""
+        self._refresh_local_indexes()
+        if self._numpy_index is None:
+            # Connects and validates the Qdrant collection
+            self.retriever
+        self._warmed = True
+
+    def search_params(self, exact=False):
+        """Qdrant search parameters (oversampling and rescoring apply to quantized collections only)"""
+        return models.SearchParams(
+            hnsw_ef=self.hnsw_ef,
+            exact=exact,
+            quantization=models.QuantizationSearchParams(
+                ignore=exact,
+                rescore=self.rescore,
+                oversampling=self.oversampling,
+            ),
+        )
+
+    def dense_search(self, query_vector, k):
+        """Return [(point id, Document, score)] nearest to a query vector"""
+        return self._dense_search(query_vector, k)[0]
+
+    def _dense_search(self, query_vector, k, with_vectors=False):
+        # Returns (hits, {point id: vector} or None)
+        if self.numpy_index is not None:
+            return self._numpy_search(query_vector, k, with_vectors)
+        points = self.retriever.client.query_points(
+            self.collection_name, **self._query_kwargs(query_vector, k, with_vectors)
+        ).points
+        return self._hits_from_points(points, with_vectors)
+
+    async def _adense_search(self, query_vector, k, with_vectors=False):
+        # Async version of _dense_search; the in-process NumPy search needs no I/O
+        if self.numpy_index is not None:
+            return self._numpy_search(query_vector, k, with_vectors)
+        response = await get_async_qdrant_client().query_points(
+            self.collection_name, **self._query_kwargs(query_vector, k, with_vectors)
+        )
+        return self._hits_from_points(response.points, with_vectors)
+
+    def _numpy_search(self, query_vector, k, with_vectors):
+        hits = self.numpy_index.search(query_vector, k)
+        if not with_vectors:
+            return hits, None
+        ids = [point_id for point_id, _, _ in hits]
+        return hits, dict(zip(ids, self.numpy_index.vectors_for(ids)))
+
+    def _query_kwargs(self, query_vector, k, with_vectors):
+        return {
+            "query": query_vector,
+            "limit": k,
+            "with_payload": True,
+            "with_vectors": with_vectors,
+            "search_params": self.search_params(),
+        }
+
+    def _hits_from_points(self, points, with_vectors):
+        hits = [
+            (
+                str(point.id),
+                QdrantVectorStore._document_from_point(point, self.collection_name, "page_content", "metadata"),
+                point.score,
+            )
+            for point in points
+        ]
+        return hits, ({str(point.id): point.vector for point in points} if with_vectors else None)
+
+    def _vectors_for(self, point_ids):
+        if self.numpy_index is not None:
+            return dict(zip(point_ids, self.numpy_index.vectors_for(point_ids)))
+        records = self.retriever.client.retrieve(
+            self.collection_name, ids=point_ids, with_payload=False, with_vectors=True
+        )
+        return {str(record.id): record.vector for record in records}
+
+    async def _avectors_for(self, point_ids):
+        if self.numpy_index is not None:
+            return dict(zip(point_ids, self.numpy_index.vectors_for(point_ids)))
+        records = await get_async_qdrant_client().retrieve(
+            self.collection_name, ids=point_ids, with_payload=False, with_vectors=True
+        )
+        return {str(record.id): record.vector for record in records}
+
+    def lexical_fast_path(self, user_input):
+        """Return confident exact-term hits from the BM25 index, or None"""
+        lexical = self.lexical_index
+        if lexical is None or not settings.LEXICAL_FAST_PATH:
+            return None
+        return lexical.confident_hits(user_input, self.k)
+
+    def search(self, user_input, query_vector):
+        """Dense search, fused with BM25 by reciprocal rank when an index exists"""
+        lexical = self.lexical_index
+        if self.retrieval == "mmr":
+            return self.mmr_search(user_input, query_vector, lexical)
+        if lexical is None:
+            return self.dense_search(query_vector, self.k)
+        candidates = max(self.k, settings.HYBRID_CANDIDATES)
+        dense_hits, _ = self._dense_search(query_vector, candidates)
+        return reciprocal_rank_fusion([dense_hits, lexical.search(user_input, candidates)], k=self.k)
+
+    async def asearch(self, user_input, query_vector):
+        """Async version of search: the Qdrant calls are awaited, so cancelling stops them"""
+        lexical = self.lexical_index
+        if self.retrieval == "mmr":
+            fetch_k = max(self.k, self.mmr_fetch_k)
+            candidates, vectors = await self._adense_search(query_vector, fetch_k, with_vectors=True)
+            candidates = self._mmr_candidates(user_input, candidates, lexical, fetch_k)
+            missing = self._missing_vectors(candidates, vectors)
+            if missing:
+                vectors.update(await self._avectors_for(missing))
+            return self._mmr_pick(candidates, vectors, lexical is not None)
+        if lexical is None:
+            return (await self._adense_search(query_vector, self.k))[0]
+        candidates = max(self.k, settings.HYBRID_CANDIDATES)
+        dense_hits, _ = await self._adense_search(query_vector, candidates)
+        return reciprocal_rank_fusion([dense_hits, lexical.search(user_input, candidates)], k=self.k)
+
+    def mmr_search(self, user_input, query_vector, lexical=None):
+        """Pick k diverse chunks from `mmr_fetch_k` candidates by max marginal relevance.
+
+        With a BM25 index the candidates are the hybrid (RRF) ranking, and
+        its min-max scaled scores serve as relevance.
+        """
+        fetch_k = max(self.k, self.mmr_fetch_k)
+        candidates, vectors = self._dense_search(query_vector, fetch_k, with_vectors=True)
+        candidates = self._mmr_candidates(user_input, candidates, lexical, fetch_k)
+        missing = self._missing_vectors(candidates, vectors)
+        if missing:
+            vectors.update(self._vectors_for(missing))
+        return self._mmr_pick(candidates, vectors, lexical is not None)
+
+    def _mmr_candidates(self, user_input, candidates, lexical, fetch_k):
+        if lexical is None:
+            return candidates
+        return reciprocal_rank_fusion([candidates, lexical.search(user_input, fetch_k)], k=fetch_k)
+
+    def _missing_vectors(self, candidates, vectors):
+        # Lexical-only candidates came without a vector; none are needed if MMR has nothing to choose
+        if len(candidates) <= self.k:
+            return []
+        return [point_id for point_id, _, _ in candidates if point_id not in vectors]
+
+    def _mmr_pick(self, candidates, vectors, fused):
+        if len(candidates) <= self.k:
+            return candidates
+        relevance = np.array([score for _, _, score in candidates], dtype=np.float32)
+        if fused:
+            spread = relevance.max() - relevance.min()
+            relevance = (relevance - relevance.min()) / spread if spread else np.ones_like(relevance)
+        matrix = np.asarray([vectors[point_id] for point_id, _, _ in candidates], dtype=np.float32)
+        picked = maximal_marginal_relevance(relevance, matrix, self.k, self.mmr_lambda)
+        return [candidates[i] for i in picked]
+
+    def build_context(self, docs):
+        """Context for the prompt: grouped by source, overlaps removed, within the token budget"""
+        return build_context(docs, settings.CONTEXT_TOKEN_BUDGET)
+
+    def build_messages(self, user_input, docs):
+        context = self.build_context(docs)
+
+        # Create messages for the LLM
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"Context:\n{context}\n\nUser Question: {user_input}"}
+        ]
+
+    def _prepare(self, user_input, trace):
+        """Return (cached answer, messages, query vector) for a question.
+
+        Exact-term questions answered by the BM25 fast path skip the embedding
+        call; the answer cache is then only consulted if the query's vector is
+        already cached locally. Stage timings, hits and cache use go to `trace`.
+        """
+        embeddings = get_embeddings()
+        query_vector = embeddings.peek(user_input)
+        trace.cache_hits["query_embedding"] = query_vector is not None
+        with trace.stage("lexical"):
+            hits = self.lexical_fast_path(user_input)
+        if hits is None and query_vector is None:
+            with trace.stage("embed"):
+                query_vector = embeddings.embed_query(user_input)
+
+        # Paraphrases of an already answered question skip retrieval and the LLM
+        cached = self._cached_answer(query_vector, trace)
+        if cached is not None:
+            return cached, None, query_vector
+
+        if hits is None:
+            with trace.stage("search"):
+                hits = self.search(user_input, query_vector)
+        return None, self._messages_for(user_input, hits, trace), query_vector
+
+    def _cached_answer(self, query_vector, trace):
+        if self.answer_cache is None or query_vector is None:
+            return None
+        with trace.stage("answer_cache"):
+            cached = self.answer_cache.lookup(query_vector)
+        if cached is not None:
+            trace.route = "answer_cache"
+            trace.cache_hits["answer"] = True
+        return cached
+
+    def _messages_for(self, user_input, hits, trace):
+        if trace.route is None:
+            trace.route = "lexical" if "search" not in trace.stages else self.search_route()
+        trace.record_hits(hits)
+        with trace.stage("prompt"):
+            return self.build_messages(user_input, [doc for _, doc, _ in hits])
+
+    def search_route(self):
+        """Name of the retrieval route used when the fast path does not apply"""
+        return "hybrid" if self.lexical_index is not None else "dense"
+
+    def _remember_answer(self, query_vector, answer):
+        if self.answer_cache is not None and query_vector is not None:
+            self.answer_cache.store(query_vector, answer)
+
+    def _finish(self, trace, answer=None, error=None):
+        trace.finish(answer, error)
+        metrics.observe(trace)
+
+    def get_result(self, user_input):
+        """Answer a question and return the full RequestTrace (answer in `.answer`)"""
+        trace = RequestTrace(self.collection_name, user_input)
+        self.get_response(user_input, trace=trace)
+        return trace
+
+    def get_response(self, user_input, trace=None):
+        trace = trace or RequestTrace(self.collection_name, user_input)
+        try:
+            cached, messages, query_vector = self._prepare(user_input, trace)
+            if cached is not None:
+                self._finish(trace, cached)
+                return cached
+
+            # Get response from LLM
+            with trace.stage("generate"):
+                response = get_llm().invoke(messages)
+        except Exception as e:
+            self._finish(trace, error=str(e))
+            raise
+
+        trace.record_tokens(messages, response.content, getattr(response, "usage_metadata", None))
+        self._remember_answer(query_vector, response.content)
+        self._finish(trace, response.content)
+        return response.content
+
+    def stream_response(self, user_input, trace=None):
+        """Yield the answer in chunks as Gemini generates it.
+
+        If a RequestTrace is given it is filled in as the stream is consumed,
+        including `time_to_first_token` and `total_time`.
+        """
+        trace = trace or RequestTrace(self.collection_name, user_input)
+        parts = []
+        usage = None
+        try:
+            cached, messages, query_vector = self._prepare(user_input, trace)
+            if cached is not None:
+                self._finish(trace, cached)
+                yield cached
+                return
+
+            with trace.stage("generate"):
+                for chunk in get_llm().stream(messages):
+                    if getattr(chunk, "usage_metadata", None):
+                        usage = chunk.usage_metadata
+                    if not chunk.content:
+                        continue
+                    trace.first_token()
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            self._finish(trace, error=str(e))
+            raise
+
+        answer = "".join(parts)
+        trace.record_tokens(messages, answer, usage)
+        self._remember_answer(query_vector, answer)
+        self._finish(trace, answer)
+
+    async def aget_response(self, user_input, trace=None):
+        """Async version of get_response.
+
+        Each stage (embed, search, generate) is bounded by its own timeout from
+        settings and raises TimeoutError naming the stage. Cancelling the
+        awaiting task cancels the embed, search or generate call in flight.
+        Local indexes are (re)loaded in a worker thread, off the event loop.
+        """
+        trace = trace or RequestTrace(self.collection_name, user_input)
+        try:
+            if not self._warmed:
+                with trace.stage("warm"):
+                    await asyncio.to_thread(self.warm)
+            elif get_index_version(self.collection_name) != self._local_version:
+                with trace.stage("warm"):
+                    await asyncio.to_thread(self._refresh_local_indexes)
+
+            embeddings = get_embeddings()
+            query_vector = embeddings.peek(user_input)
+            trace.cache_hits["query_embedding"] = query_vector is not None
+            with trace.stage("lexical"):
+                hits = self.lexical_fast_path(user_input)
+            if hits is None and query_vector is None:
+                with trace.stage("embed"):
+                    query_vector = await _with_timeout(
+                        "embed", embeddings.aembed_query(user_input), settings.EMBED_TIMEOUT
+                    )
+
+            cached = self._cached_answer(query_vector, trace)
+            if cached is not None:
+                self._finish(trace, cached)
+                return cached
+
+            if hits is None:
+                with trace.stage("search"):
+                    hits = await _with_timeout(
+                        "search", self.asearch(user_input, query_vector), settings.SEARCH_TIMEOUT
+                    )
+            messages = self._messages_for(user_input, hits, trace)
+
+            with trace.stage("generate"):
+                response = await _with_timeout(
+                    "generate", get_llm().ainvoke(messages), settings.GENERATE_TIMEOUT
+                )
+        except Exception as e:
+            self._finish(trace, error=str(e))
+            raise
+
+        trace.record_tokens(messages, response.content, getattr(response, "usage_metadata", None))
+        self._remember_answer(query_vector, response.content)
+        self._finish(trace, response.content)
+        return response.content
+
+
+async def _with_timeout(stage, awaitable, timeout):
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        raise TimeoutError(f"{stage} stage timed out after {timeout}s") from e
@@ -0,0 +1,128 @@
+"""
+Query-embedding cache placed in front of the Gemini embeddings client.
+
+Questions are normalised (case and whitespace) and looked up in an in-memory
+LRU, then in an optional SQLite file, before paying for an embedding round
+trip. Entries are keyed by embedding model name, so switching models never
+returns a vector from the old one.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_query(text):
+    """Collapse case and whitespace so trivially different questions share a key"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that caches `embed_query` results.
+
+    Document embeddings (used at ingestion time) are passed straight through.
+    """
+
+    def __init__(self, embeddings, model_name, max_size=2048, disk_path=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_size = max_size
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT, query TEXT, vector BLOB, PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+    def _lookup(self, key, count_miss=True):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?",
+                    (self.model_name, key),
+                ).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?)",
+                    (self.model_name, key, array("f", vector).tobytes()),
+                )
+                self._db.commit()
+
+    def peek(self, text):
+        """Return the cached vector for a query without calling the API (or None).
+
+        Hits count and refresh recency like embed_query's; a miss is only
+        counted once the API is actually called.
+        """
+        return self._lookup(normalize_query(text), count_miss=False)
+
+    def embed_query(self, text):
+        key = normalize_query(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text):
+        key = normalize_query(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._store(key, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self):
+        """Return hit/miss counters for the cache"""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._memory),
+            }
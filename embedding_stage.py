@@ -0,0 +1,123 @@
+"""
+Batched, adaptively throttled embedding of chunks during ingestion.
+
+Chunks are embedded in batches of `batch_size` with at most `max_in_flight`
+batches running at once. The number of batches in flight follows AIMD: it
+grows by about one batch per round of successes and is halved whenever the
+API reports a rate limit. A failed batch is put back in the queue with
+backoff, and batches that already finished are never embedded again.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import settings
+
+RATE_LIMIT_MARKERS = ("429", "resource_exhausted", "resource exhausted", "rate limit", "quota")
+
+# Rough characters-per-token ratio used for the tokens/s progress figure
+CHARS_PER_TOKEN = 4
+
+
+class EmbeddingStageError(RuntimeError):
+    """A batch still failed after all retries"""
+
+
+def is_rate_limit_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def _print_progress(progress):
+    print(
+        f"  Embedded {progress['chunks_done']}/{progress['chunks_total']} chunks | "
+        f"{progress['chunks_per_second']:.1f} chunks/s | "
+        f"~{progress['tokens_per_second']:.0f} tokens/s | "
+        f"{progress['in_flight_limit']} batch(es) in flight"
+    )
+
+
+def embed_chunks(
+    chunks,
+    embeddings,
+    batch_size=settings.EMBED_BATCH_SIZE,
+    max_in_flight=settings.EMBED_MAX_IN_FLIGHT,
+    retries=settings.EMBED_RETRIES,
+    backoff=1.0,
+    on_progress=_print_progress,
+    concurrency_gate=None,
+):
+    """Embed Documents and return their vectors in the same order.
+
+    `concurrency_gate`, if given, is a semaphore each batch must hold while it
+    calls the API, so several collections can share one global limit.
+    """
+    texts = [chunk.page_content for chunk in chunks]
+    batches = [(start, texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+    vectors = [None] * len(texts)
+    if not batches:
+        return vectors
+
+    gate = concurrency_gate or threading.BoundedSemaphore(max_in_flight)
+
+    def run_batch(batch_texts):
+        with gate:
+            return embeddings.embed_documents(batch_texts)
+
+    # (batch, attempts, earliest start time)
+    pending = [(batch, 0, 0.0) for batch in batches]
+    running = {}
+    limit = 1.0
+    chunks_done = 0
+    chars_done = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while pending or running:
+            now = time.perf_counter()
+            while pending and len(running) < int(limit):
+                ready = [item for item in pending if item[2] <= now]
+                if not ready:
+                    break
+                item = ready[0]
+                pending.remove(item)
+                running[executor.submit(run_batch, item[0][1])] = item
+
+            if not running:
+                # Everything left is backing off
+                time.sleep(max(0.0, min(item[2] for item in pending) - now))
+                continue
+
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                (start, batch_texts), attempts, _ = running.pop(future)
+                try:
+                    batch_vectors = future.result()
+                except Exception as e:
+                    if attempts >= retries:
+                        raise EmbeddingStageError(
+                            f"Batch at chunk {start} failed after {attempts + 1} attempts: {e}"
+                        ) from e
+                    if is_rate_limit_error(e):
+                        limit = max(1.0, limit / 2)
+                    delay = backoff * (2 ** attempts) + random.uniform(0, backoff)
+                    pending.append(((start, batch_texts), attempts + 1, time.perf_counter() + delay))
+                    continue
+
+                vectors[start:start + len(batch_vectors)] = batch_vectors
+                limit = min(float(max_in_flight), limit + 1.0 / limit)
+                chunks_done += len(batch_texts)
+                chars_done += sum(len(text) for text in batch_texts)
+                if on_progress is not None:
+                    elapsed = max(time.perf_counter() - started, 1e-9)
+                    on_progress({
+                        "chunks_done": chunks_done,
+                        "chunks_total": len(texts),
+                        "chunks_per_second": chunks_done / elapsed,
+                        "tokens_per_second": chars_done / CHARS_PER_TOKEN / elapsed,
+                        "in_flight_limit": int(limit),
+                    })
+
+    return vectors
@@ -0,0 +1,58 @@
+"""
+Index versions for the Qdrant collections.
+
+Every successful (re-)index of a collection records a new version in
+.chai_cache/index_versions.json. Caches that depend on a collection's
+contents (such as the semantic answer cache) compare versions and drop their
+entries when the collection has been re-indexed, even by another process.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+import settings
+
+_lock = threading.Lock()
+_cached_versions = {}
+_cached_mtime = None
+
+
+def _versions_path():
+    return os.path.join(settings.CACHE_DIR, "index_versions.json")
+
+
+def _read_versions():
+    global _cached_versions, _cached_mtime
+    path = _versions_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    # Only re-read the file when another process has touched it
+    if mtime != _cached_mtime:
+        with open(path, encoding="utf-8") as f:
+            _cached_versions = json.load(f)
+        _cached_mtime = mtime
+    return _cached_versions
+
+
+def get_index_version(collection_name):
+    """Return the current index version of a collection ("" if never recorded)"""
+    with _lock:
+        return _read_versions().get(collection_name, "")
+
+
+def bump_index_version(collection_name):
+    """Record that a collection has just been (re-)indexed"""
+    with _lock:
+        versions = dict(_read_versions())
+        versions[collection_name] = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(settings.CACHE_DIR, exist_ok=True)
+        tmp_path = _versions_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(versions, f, indent=2)
+        os.replace(tmp_path, _versions_path())
+        return versions[collection_name]
@@ -0,0 +1,336 @@
+"""
+Incremental indexing of a Qdrant collection.
+
+Every page and chunk is hashed, and point IDs are derived from
+(url, chunk hash), so the same chunk always maps to the same point. On a
+re-run only new or changed chunks are embedded and upserted, and points whose
+chunk disappeared (or whose page left the config) are deleted. Every point
+also records the version of the extraction and chunking that produced it,
+so changing either re-chunks pages even when their HTML is unchanged.
+"""
+
+import hashlib
+import uuid
+
+from qdrant_client import models
+
+import settings
+from content_extraction import EXTRACTION_VERSION
+from dedup import deduplicate_chunks
+from embedding_stage import embed_chunks
+from page_fetcher import html_to_document
+
+# Fixed namespace so point IDs are stable across runs and machines
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3b9e-2a47-4d0f-9a8e-5c2b7d4e1f30")
+
+
+def content_hash(text):
+    """Return a stable hash of a page's or chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_point_id(url, chunk_hash):
+    """Return the deterministic Qdrant point ID for a chunk of a page"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{url}\n{chunk_hash}"))
+
+
+def chunking_version(text_splitter):
+    """Identify how pages become chunks: the content extraction and the splitter settings"""
+    extraction = f"extraction-{EXTRACTION_VERSION}" if settings.CONTENT_EXTRACTION else "full-page"
+    splitter = getattr(text_splitter, "version", None)
+    if splitter is None:
+        splitter = "-".join(
+            str(part) for part in (
+                type(text_splitter).__name__,
+                getattr(text_splitter, "_chunk_size", ""),
+                getattr(text_splitter, "_chunk_overlap", ""),
+            )
+        )
+    return f"{extraction}/{splitter}"
+
+
+def ensure_collection(client, collection_name, vector_size, hnsw=None):
+    """Create the collection if it does not exist yet.
+
+    `hnsw` is an optional dict of HNSW settings, e.g. {"m": 16, "ef_construct": 100}.
+    """
+    if client.collection_exists(collection_name):
+        return False
+    client.create_collection(
+        collection_name,
+        vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+        hnsw_config=models.HnswConfigDiff(**hnsw) if hnsw else None,
+    )
+    return True
+
+
+def configure_hnsw(client, collection_name, hnsw):
+    """Apply HNSW settings to an existing collection (Qdrant rebuilds the graph if they changed)"""
+    client.update_collection(collection_name, hnsw_config=models.HnswConfigDiff(**hnsw))
+
+
+def quantization_config(quantization):
+    """Return the Qdrant quantization config for "scalar", "binary" or "none" """
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    if quantization == "none":
+        return models.Disabled.DISABLED
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def configure_quantization(client, collection_name, quantization):
+    """Quantize a collection's vectors in RAM and keep the originals on disk.
+
+    The full-precision vectors stay available for rescoring. "none" turns
+    quantization off and moves the originals back into RAM.
+    """
+    client.update_collection(
+        collection_name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=quantization != "none")},
+        quantization_config=quantization_config(quantization),
+    )
+
+
+def split_pages(docs, text_splitter):
+    """Split pages into chunks and return (chunks, point IDs).
+
+    Chunks carry the same page_hash, chunk_hash and chunking_version
+    metadata incremental_index writes, so a full build can later be updated
+    incrementally. Identical chunks of one page share a single point.
+    """
+    version = chunking_version(text_splitter)
+    chunks, ids = [], []
+    seen = set()
+    for doc in docs:
+        url = doc.metadata.get("source")
+        page_hash = content_hash(doc.page_content)
+        for chunk in text_splitter.split_documents([doc]):
+            chunk_hash = content_hash(chunk.page_content)
+            point_id = chunk_point_id(url, chunk_hash)
+            if point_id in seen:
+                continue
+            seen.add(point_id)
+            chunk.metadata["page_hash"] = page_hash
+            chunk.metadata["chunk_hash"] = chunk_hash
+            chunk.metadata["chunking_version"] = version
+            chunks.append(chunk)
+            ids.append(point_id)
+    return chunks, ids
+
+
+def upsert_chunks(client, collection_name, chunks, vectors, ids=None, batch_size=256):
+    """Write embedded chunks with the payload layout QdrantVectorStore reads.
+
+    Without `ids`, each chunk's ID is derived from its source URL and text,
+    so writing the same chunk again overwrites it instead of adding a copy.
+    """
+    ids = ids or [
+        chunk_point_id(chunk.metadata.get("source"), content_hash(chunk.page_content)) for chunk in chunks
+    ]
+    for start in range(0, len(chunks), batch_size):
+        client.upsert(
+            collection_name,
+            points=[
+                models.PointStruct(
+                    id=point_id,
+                    vector=vector,
+                    payload={"page_content": chunk.page_content, "metadata": chunk.metadata},
+                )
+                for point_id, chunk, vector in zip(
+                    ids[start:start + batch_size],
+                    chunks[start:start + batch_size],
+                    vectors[start:start + batch_size],
+                )
+            ],
+        )
+
+
+def iter_points(client, collection_name, with_payload=True, with_vectors=False, batch_size=1000):
+    """Yield every point (Record) of a collection, scrolling in batches"""
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+        yield from records
+        if offset is None:
+            return
+
+
+def existing_points(client, collection_name):
+    """Return {point id: (source url, page hash, chunking version, duplicate sources)} for every point.
+
+    Duplicate sources are the pages whose near-copies of the chunk were
+    dropped by deduplication, so the point stands in for them too.
+    """
+    points = {}
+    if not client.collection_exists(collection_name):
+        return points
+    for record in iter_points(client, collection_name, with_payload=["metadata"]):
+        metadata = (record.payload or {}).get("metadata") or {}
+        points[str(record.id)] = (
+            metadata.get("source"),
+            metadata.get("page_hash"),
+            metadata.get("chunking_version"),
+            tuple(metadata.get("duplicate_sources") or ()),
+        )
+    return points
+
+
+def delete_points_except(client, collection_name, keep_ids, keep_sources=()):
+    """Delete every point not in `keep_ids` or from a page in `keep_sources`; return how many"""
+    stale_ids = [
+        point_id
+        for point_id, (source, _, _, _) in existing_points(client, collection_name).items()
+        if point_id not in keep_ids and source not in keep_sources
+    ]
+    if stale_ids:
+        client.delete(collection_name, points_selector=models.PointIdsList(points=stale_ids))
+    return len(stale_ids)
+
+
+def incremental_index(
+    client,
+    collection_name,
+    docs,
+    text_splitter,
+    embeddings,
+    keep_sources=(),
+    unchanged_pages=None,
+    dedup_threshold=None,
+    **embed_kwargs
+):
+    """Bring a collection in line with `docs`, embedding only what changed.
+
+    Points of pages listed in `keep_sources` (e.g. pages that failed to
+    download this run) are left untouched. `unchanged_pages` maps URLs the
+    server answered with 304 to their cached HTML: they are only parsed if
+    the collection has no points for them yet, or has them from another
+    chunking_version (extraction or splitter settings). With `dedup_threshold`, new
+    chunks that are near-duplicates of each other are dropped before
+    embedding; an unchanged page is processed again when a point standing in
+    for one of its dropped chunks is deleted. Extra keyword arguments go to embed_chunks. Returns a dict of
+    counters describing what was done.
+    """
+    existing = existing_points(client, collection_name)
+    version = chunking_version(text_splitter)
+
+    # Group the stored points by page so unchanged pages can be skipped whole
+    pages = {}
+    page_versions = {}
+    for point_id, (source, page_hash, point_version, _) in existing.items():
+        pages.setdefault(source, {}).setdefault(page_hash, set()).add(point_id)
+        page_versions.setdefault(source, set()).add(point_version)
+
+    stats = {
+        "pages_unchanged": 0,
+        "pages_changed": 0,
+        "chunks_kept": 0,
+        "chunks_added": 0,
+        "chunks_deleted": 0,
+        "chunks_duplicate": 0,
+    }
+    keep_ids = set()
+    for source in keep_sources:
+        for point_ids in pages.get(source, {}).values():
+            keep_ids |= point_ids
+    new_chunks, new_ids = [], []
+    refreshed = {}
+    # Pages skipped as unchanged, with their document (None for 304s, parsed only if needed)
+    skipped = {}
+
+    def add_page(doc):
+        url = doc.metadata.get("source")
+        page_hash = content_hash(doc.page_content)
+        stats["pages_changed"] += 1
+        for chunk in text_splitter.split_documents([doc]):
+            chunk_hash = content_hash(chunk.page_content)
+            point_id = chunk_point_id(url, chunk_hash)
+            if point_id in keep_ids:
+                continue
+            keep_ids.add(point_id)
+            chunk.metadata["page_hash"] = page_hash
+            chunk.metadata["chunk_hash"] = chunk_hash
+            chunk.metadata["chunking_version"] = version
+            if point_id in existing:
+                # Same chunk on a changed or re-chunked page: keep the vector, refresh the metadata
+                duplicate_sources = existing[point_id][3]
+                if duplicate_sources:
+                    chunk.metadata["duplicate_sources"] = list(duplicate_sources)
+                refreshed[point_id] = chunk.metadata
+                stats["chunks_kept"] += 1
+                continue
+            new_chunks.append(chunk)
+            new_ids.append(point_id)
+
+    def skip_page(url, doc=None):
+        point_ids = set().union(*pages[url].values())
+        keep_ids.update(point_ids)
+        skipped[url] = doc
+        stats["pages_unchanged"] += 1
+        stats["chunks_kept"] += len(point_ids)
+
+    for doc in docs:
+        url = doc.metadata.get("source")
+        if set(pages.get(url, {})) == {content_hash(doc.page_content)} and page_versions[url] == {version}:
+            skip_page(url, doc)
+        else:
+            add_page(doc)
+    for url, html in (unchanged_pages or {}).items():
+        if url in pages and page_versions[url] == {version}:
+            skip_page(url)
+        else:
+            add_page(html_to_document(url, html))
+
+    # A stale point may stand in for near-duplicate chunks of pages skipped
+    # above: those pages are processed after all, so their copy is embedded.
+    # Points standing in for pages that failed to download are kept.
+    orphaned = []
+    for point_id, (_, _, _, duplicate_sources) in existing.items():
+        if point_id in keep_ids:
+            continue
+        for source in duplicate_sources:
+            if source in keep_sources:
+                keep_ids.add(point_id)
+            elif source in skipped and source not in orphaned:
+                orphaned.append(source)
+    for url in orphaned:
+        doc = skipped.pop(url) or html_to_document(url, unchanged_pages[url])
+        stats["pages_unchanged"] -= 1
+        add_page(doc)
+
+    if dedup_threshold and new_chunks:
+        new_chunks, new_ids, dedup_stats = deduplicate_chunks(new_chunks, new_ids, threshold=dedup_threshold)
+        stats["chunks_duplicate"] = dedup_stats["duplicates"]
+
+    if refreshed:
+        client.batch_update_points(
+            collection_name,
+            update_operations=[
+                models.SetPayloadOperation(
+                    set_payload=models.SetPayload(payload={"metadata": metadata}, points=[point_id])
+                )
+                for point_id, metadata in refreshed.items()
+            ],
+        )
+
+    if new_chunks:
+        vectors = embed_chunks(new_chunks, embeddings, **embed_kwargs)
+        ensure_collection(client, collection_name, len(vectors[0]))
+        upsert_chunks(client, collection_name, new_chunks, vectors, ids=new_ids)
+        stats["chunks_added"] = len(new_chunks)
+
+    stale_ids = [point_id for point_id in existing if point_id not in keep_ids]
+    if stale_ids:
+        client.delete(collection_name, points_selector=models.PointIdsList(points=stale_ids))
+        stats["chunks_deleted"] = len(stale_ids)
+
+    return stats
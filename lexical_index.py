@@ -0,0 +1,174 @@
+"""
+Local BM25 index kept next to each Qdrant collection.
+
+The index is built from the collection's points at ingestion time and saved
+under .chai_cache/lexical/. At query time it gives a fast path for questions
+that name an exact term ("git cherry-pick", "<dialog> tag", "LEFT JOIN"):
+when the query's distinctive terms are rare in the collection, every top hit
+contains them and the top hits clearly outscore the next one, they are used
+directly and the embedding round trip is skipped. Other queries fuse lexical
+and dense rankings with reciprocal-rank fusion.
+"""
+
+import gzip
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+
+import settings
+from indexing import iter_points
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-+#]+[a-z0-9]*)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "of", "on", "or", "should", "tell", "the", "to", "use",
+    "what", "when", "where", "which", "who", "why", "with", "you",
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens that keep terms like cherry-pick and c++ whole"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def query_terms(text):
+    """Distinct content terms of a query, in order"""
+    terms = []
+    for token in tokenize(text):
+        if token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms
+
+
+def lexical_index_path(collection_name):
+    return os.path.join(settings.CACHE_DIR, "lexical", f"{collection_name}.json.gz")
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of chunks"""
+
+    def __init__(self, ids, docs, k1=1.5, b=0.75):
+        self.ids = list(ids)
+        self.docs = list(docs)
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = []
+        for position, doc in enumerate(self.docs):
+            counts = Counter(tokenize(doc.page_content))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((position, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        total = len(self.docs)
+        self.idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query, k=4):
+        """Return [(point id, Document, score)] for the best matching chunks"""
+        scores = {}
+        for term in query_terms(query):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[position], self.docs[position], score) for position, score in best]
+
+    def document_frequency(self, term):
+        """Share of chunks containing `term`"""
+        return len(self.postings.get(term, ())) / len(self.docs) if self.docs else 0.0
+
+    def confident_hits(
+        self,
+        query,
+        k=4,
+        max_terms=4,
+        common_df=settings.LEXICAL_COMMON_DF,
+        max_df=settings.LEXICAL_MAX_DF,
+        min_margin=settings.LEXICAL_MIN_MARGIN,
+    ):
+        """Return the top hits for a confident exact-term match, else None.
+
+        Only short, term-like queries qualify; longer questions need the
+        dense retriever to capture their meaning. Terms found in more than
+        `common_df` of the chunks ("git" in the Git docs) say nothing about
+        which chunk is meant and are ignored. Every remaining term must be
+        rare (in at most `max_df` of the chunks), every top hit must contain
+        them all, and the k-th hit must outscore the next one by `min_margin`.
+        """
+        terms = query_terms(query)
+        if not terms or len(terms) > max_terms:
+            return None
+        if any(term not in self.postings for term in terms):
+            return None
+        terms = [term for term in terms if self.document_frequency(term) <= common_df]
+        if not terms or any(self.document_frequency(term) > max_df for term in terms):
+            return None
+        hits = self.search(" ".join(terms), k + 1)
+        if len(hits) < k:
+            return None
+        if len(hits) > k and hits[k - 1][2] < min_margin * hits[k][2]:
+            return None
+        hits = hits[:k]
+        for _, doc, _ in hits:
+            tokens = set(tokenize(doc.page_content))
+            if not all(term in tokens for term in terms):
+                return None
+        return hits
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        data = {
+            "ids": self.ids,
+            "docs": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in self.docs],
+            "k1": self.k1,
+            "b": self.b,
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in data["docs"]]
+        return cls(data["ids"], docs, k1=data["k1"], b=data["b"])
+
+
+def build_lexical_index(client, collection_name):
+    """Build the BM25 index from every point in a collection and save it"""
+    ids, docs = [], []
+    for record in iter_points(client, collection_name):
+        payload = record.payload or {}
+        metadata = dict(payload.get("metadata") or {})
+        metadata["_id"] = str(record.id)
+        metadata["_collection_name"] = collection_name
+        ids.append(str(record.id))
+        docs.append(Document(page_content=payload.get("page_content", ""), metadata=metadata))
+    index = BM25Index(ids, docs)
+    index.save(lexical_index_path(collection_name))
+    return index
+
+
+def reciprocal_rank_fusion(rankings, k=4, rank_constant=60):
+    """Fuse several [(point id, Document, score)] rankings into one top-k list"""
+    fused = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, (point_id, doc, _) in enumerate(ranking):
+            fused[point_id] = fused.get(point_id, 0.0) + 1.0 / (rank_constant + rank + 1)
+            documents.setdefault(point_id, doc)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(point_id, documents[point_id], score) for point_id, score in best]
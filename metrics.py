@@ -0,0 +1,138 @@
+"""
+Request metrics aggregated from RequestTraces, in Prometheus text format.
+
+Every finished request is observed into histograms (per-stage durations,
+total time, time to first token, prompt and response tokens) and counters
+(requests by route, cache hits, errors), labelled by collection. render()
+returns the exposition text; start_metrics_server() serves it on /metrics.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        counts, total = self.series.get(key, ([0] * len(self.buckets), [0, 0.0]))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        total[0] += 1
+        total[1] += value
+        self.series[key] = (counts, total)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, (count, value_sum)) in sorted(self.series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {value_sum}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+_lock = threading.Lock()
+stage_seconds = Histogram("chai_stage_duration_seconds", "Time spent in each request stage", SECONDS_BUCKETS)
+request_seconds = Histogram("chai_request_duration_seconds", "Total time to answer a question", SECONDS_BUCKETS)
+first_token_seconds = Histogram("chai_time_to_first_token_seconds", "Time until the first answer token", SECONDS_BUCKETS)
+prompt_tokens = Histogram("chai_prompt_tokens", "Prompt tokens sent to the LLM", TOKEN_BUCKETS)
+response_tokens = Histogram("chai_response_tokens", "Response tokens generated by the LLM", TOKEN_BUCKETS)
+requests_total = Counter("chai_requests_total", "Answered requests by route")
+cache_hits_total = Counter("chai_cache_hits_total", "Cache hits by cache")
+errors_total = Counter("chai_request_errors_total", "Requests that failed")
+_metrics = (
+    stage_seconds, request_seconds, first_token_seconds, prompt_tokens, response_tokens,
+    requests_total, cache_hits_total, errors_total,
+)
+
+
+def observe(trace):
+    """Add a finished RequestTrace to the aggregates"""
+    collection = trace.collection_name
+    with _lock:
+        for stage, seconds in trace.stages.items():
+            stage_seconds.observe(seconds, collection=collection, stage=stage)
+        if trace.error is not None:
+            errors_total.inc(collection=collection)
+            return
+        request_seconds.observe(trace.total_time, collection=collection)
+        if trace.time_to_first_token is not None:
+            first_token_seconds.observe(trace.time_to_first_token, collection=collection)
+        if trace.prompt_tokens is not None:
+            prompt_tokens.observe(trace.prompt_tokens, collection=collection)
+        if trace.response_tokens is not None:
+            response_tokens.observe(trace.response_tokens, collection=collection)
+        requests_total.inc(collection=collection, route=trace.route)
+        for cache, hit in trace.cache_hits.items():
+            if hit:
+                cache_hits_total.inc(collection=collection, cache=cache)
+
+
+def render():
+    """Return every metric in Prometheus text exposition format"""
+    with _lock:
+        lines = []
+        for metric in _metrics:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics from a daemon thread and return the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
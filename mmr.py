@@ -0,0 +1,43 @@
+"""
+Maximal marginal relevance: pick results that are relevant but not redundant.
+
+Sources like MDN and w3schools cover the same ground, and neighbouring chunks
+share their splitter overlap, so a plain top-k often returns near-copies.
+MMR takes a larger candidate set and greedily picks the candidate with the
+best trade-off between relevance to the question and similarity to what has
+already been picked. All pairwise similarities come from one matrix product.
+"""
+
+import numpy as np
+
+
+def maximal_marginal_relevance(relevance, vectors, k=4, lambda_mult=0.5):
+    """Return the indices of `k` candidates in pick order.
+
+    `relevance` holds one score per candidate (higher is better) and
+    `vectors` their embeddings. `lambda_mult` is 1 for pure relevance and 0
+    for pure diversity.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    count = len(relevance)
+    if count == 0:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    similarity = matrix @ matrix.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(count, dtype=bool)
+    available[first] = False
+    # Highest similarity of each candidate to anything already selected
+    redundancy = similarity[first].copy()
+    while len(selected) < min(k, count):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
@@ -0,0 +1,93 @@
+"""
+In-process vector index for small collections.
+
+A collection's vectors are normalised and written once to a float32 .npy
+matrix (memory-mapped on load) next to a JSONL file of point IDs, texts and
+metadata. Cosine top-k is then a single matrix-vector product, with no HTTP
+round trip to Qdrant. Results have the same (point id, Document, score) shape
+and the same Document metadata as the Qdrant path.
+"""
+
+import json
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+
+import settings
+from indexing import iter_points
+
+
+def numpy_index_dir(collection_name):
+    return os.path.join(settings.CACHE_DIR, "numpy", collection_name)
+
+
+class NumpyVectorIndex:
+    """Exact cosine search over a memory-mapped float32 matrix"""
+
+    def __init__(self, ids, docs, matrix):
+        self.ids = ids
+        self.docs = docs
+        self.matrix = matrix
+        self._rows = {point_id: row for row, point_id in enumerate(ids)}
+
+    def vectors_for(self, point_ids):
+        """Return the (normalised) vectors of the given points as a matrix"""
+        return np.asarray(self.matrix[[self._rows[point_id] for point_id in point_ids]])
+
+    def search(self, query_vector, k=4):
+        """Return [(point id, Document, score)] for the k most similar chunks"""
+        if not self.ids:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], self.docs[i], float(scores[i])) for i in top]
+
+    @classmethod
+    def load(cls, directory, collection_name):
+        ids, docs = [], []
+        with open(os.path.join(directory, "points.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                point = json.loads(line)
+                metadata = point["metadata"]
+                metadata["_id"] = point["id"]
+                metadata["_collection_name"] = collection_name
+                ids.append(point["id"])
+                docs.append(Document(page_content=point["page_content"], metadata=metadata))
+        matrix = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        return cls(ids, docs, matrix)
+
+
+def write_numpy_index(directory, ids, texts, metadatas, vectors):
+    """Write normalised vectors and their points to `directory`"""
+    os.makedirs(directory, exist_ok=True)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.size:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+    np.save(os.path.join(directory, "vectors.tmp.npy"), matrix)
+    with open(os.path.join(directory, "points.tmp.jsonl"), "w", encoding="utf-8") as f:
+        for point_id, text, metadata in zip(ids, texts, metadatas):
+            f.write(json.dumps({"id": point_id, "page_content": text, "metadata": metadata}) + "\n")
+    os.replace(os.path.join(directory, "vectors.tmp.npy"), os.path.join(directory, "vectors.npy"))
+    os.replace(os.path.join(directory, "points.tmp.jsonl"), os.path.join(directory, "points.jsonl"))
+
+
+def build_numpy_index(client, collection_name):
+    """Copy a collection's points and vectors out of Qdrant into a local index"""
+    ids, texts, metadatas, vectors = [], [], [], []
+    for record in iter_points(client, collection_name, with_vectors=True):
+        payload = record.payload or {}
+        ids.append(str(record.id))
+        texts.append(payload.get("page_content", ""))
+        metadatas.append(payload.get("metadata") or {})
+        vectors.append(record.vector)
+    directory = numpy_index_dir(collection_name)
+    write_numpy_index(directory, ids, texts, metadatas, vectors)
+    return NumpyVectorIndex.load(directory, collection_name)
@@ -0,0 +1,77 @@
+"""
+Compressed on-disk cache of fetched documentation pages.
+
+Entries are keyed by canonical URL and hold the page HTML together with the
+ETag / Last-Modified validators the server sent. The fetcher uses them for
+conditional GETs, so an unchanged page costs a 304 instead of a full
+download (and, in incremental mode, no parsing or embedding at all).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import settings
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url):
+    """Normalise a URL so trivially different spellings share one cache entry"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class PageCache:
+    """Gzipped JSON files, one per canonical URL"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(settings.CACHE_DIR, "pages")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, url):
+        key = hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, url):
+        """Return the cached entry for a URL, or None"""
+        try:
+            with gzip.open(self._path(url), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+    def put(self, url, html, etag=None, last_modified=None):
+        entry = {
+            "url": canonical_url(url),
+            "html": html,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+        path = self._path(url)
+        # Write to a temporary file first so concurrent readers never see half an entry
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Request headers that let the server answer 304 Not Modified"""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
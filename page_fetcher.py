@@ -0,0 +1,171 @@
+"""
+Concurrent page fetching for ingestion.
+
+Pages are downloaded with aiohttp over one shared connection pool, with a cap
+on connections per host and a minimum delay between requests to the same host.
+Timeouts, connection errors, 429s and 5xx responses are retried with
+exponential backoff. The HTML is turned into Documents with WebBaseLoader's
+metadata, keeping only the main content of each page by default (see
+content_extraction.py).
+
+Pages are revalidated against the on-disk PageCache with conditional GETs;
+a 304 reuses the cached HTML and marks the result `not_modified`.
+"""
+
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from langchain_community.document_loaders.web_base import _build_metadata, default_header_template
+
+import settings
+from content_extraction import extract_main_content
+from page_cache import PageCache
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _HostThrottle:
+    """Spaces out request starts to the same host by at least `delay` seconds"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._locks = {}
+        self._next_start = {}
+
+    async def wait(self, url):
+        host = urlsplit(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            loop = asyncio.get_running_loop()
+            wait = self._next_start.get(host, 0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_start[host] = loop.time() + self.delay
+
+
+async def _fetch_one(session, throttle, cache, url, retries, backoff):
+    result = {
+        "url": url,
+        "final_url": url,
+        "content_type": None,
+        "status": None,
+        "html": None,
+        "not_modified": False,
+        "seconds": 0.0,
+        "attempts": 0,
+        "error": None,
+    }
+    cached = cache.get(url) if cache is not None else None
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        result["attempts"] = attempt + 1
+        await throttle.wait(url)
+        try:
+            async with session.get(url, headers=PageCache.conditional_headers(cached)) as response:
+                result["status"] = response.status
+                result["final_url"] = str(response.url)
+                result["content_type"] = response.content_type
+                if response.status == 304 and cached is not None:
+                    result["html"] = cached["html"]
+                    result["not_modified"] = True
+                    result["error"] = None
+                    break
+                if response.status in RETRY_STATUSES:
+                    retry_after = response.headers.get("Retry-After", "")
+                    raise _RetryableStatus(
+                        response.status, float(retry_after) if retry_after.isdigit() else None
+                    )
+                if response.status >= 400:
+                    result["error"] = f"HTTP {response.status}"
+                    break
+                result["html"] = await response.text(errors="replace")
+                result["error"] = None
+                if cache is not None:
+                    cache.put(
+                        url,
+                        result["html"],
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                    )
+                break
+        except (aiohttp.ClientError, asyncio.TimeoutError, _RetryableStatus) as e:
+            result["error"] = str(e) or type(e).__name__
+            if attempt == retries:
+                break
+            delay = backoff * (2 ** attempt) + random.uniform(0, backoff)
+            if isinstance(e, _RetryableStatus) and e.retry_after is not None:
+                delay = max(delay, e.retry_after)
+            await asyncio.sleep(delay)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+async def fetch_all(
+    urls,
+    max_connections=settings.FETCH_MAX_CONNECTIONS,
+    per_host=settings.FETCH_PER_HOST,
+    delay=settings.FETCH_DELAY,
+    retries=settings.FETCH_RETRIES,
+    backoff=settings.FETCH_BACKOFF,
+    timeout=settings.FETCH_TIMEOUT,
+    cache=None,
+):
+    """Fetch every URL concurrently and return one result dict per URL, in order"""
+    connector = aiohttp.TCPConnector(limit=max_connections, limit_per_host=per_host)
+    throttle = _HostThrottle(delay)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=default_header_template,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+        return await asyncio.gather(
+            *(_fetch_one(session, throttle, cache, url, retries, backoff) for url in urls)
+        )
+
+
+def html_to_document(url, html, parser="html.parser", extract=None, report=None):
+    """Build a Document for a page with WebBaseLoader's metadata.
+
+    With `extract` (default: settings.CONTENT_EXTRACTION) only the main
+    content is kept, and metadata["extraction"] records how it was found.
+    If `report` is a list, a row for content_extraction.extraction_report is
+    appended to it, taken from the same parse.
+    """
+    soup = BeautifulSoup(html, parser)
+    metadata = _build_metadata(soup, url)
+    if not (settings.CONTENT_EXTRACTION if extract is None else extract):
+        return Document(page_content=soup.get_text(), metadata=metadata)
+    full_text = soup.get_text() if report is not None else None
+    text, metadata["extraction"] = extract_main_content(soup, url)
+    if report is not None:
+        report.append({"url": url, "method": metadata["extraction"], "full_text": full_text, "main_text": text})
+    return Document(page_content=text, metadata=metadata)
+
+
+def load_documents(urls, skip_unchanged=False, use_cache=True, report=None, **kwargs):
+    """Fetch pages concurrently and return (documents, per-URL fetch results).
+
+    With `skip_unchanged`, pages the server answered with 304 are not parsed
+    and get no Document; the caller keeps what it indexed last time.
+    `report` is passed on to html_to_document.
+    """
+    cache = PageCache() if use_cache else None
+    results = asyncio.run(fetch_all(urls, cache=cache, **kwargs))
+    docs = [
+        html_to_document(r["url"], r["html"], report=report)
+        for r in results
+        if r["html"] is not None and not (skip_unchanged and r["not_modified"])
+    ]
+    return docs, results
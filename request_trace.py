@@ -0,0 +1,107 @@
+"""
+Structured record of how one question was answered.
+
+DocsEngine fills a RequestTrace while it works: how long each stage took,
+which route answered (answer cache, BM25 fast path, hybrid or dense search),
+the chunks retrieved with their scores, prompt and response token counts and
+cache hits. The app shows it in the debug sidebar and source references,
+and metrics.py aggregates finished traces into histograms.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), used when the API reports none and to size chunks"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class RequestTrace:
+    """Timings, retrieved chunks, token counts and cache hits for one request"""
+
+    def __init__(self, collection_name, question):
+        self.collection_name = collection_name
+        self.question = question
+        self.route = None
+        self.stages = {}
+        self.chunks = []
+        self.prompt_tokens = None
+        self.response_tokens = None
+        self.tokens_estimated = False
+        self.cache_hits = {"query_embedding": False, "answer": False}
+        self.time_to_first_token = None
+        self.total_time = None
+        self.answer = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of work and add it to the named stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def first_token(self):
+        if self.time_to_first_token is None:
+            self.time_to_first_token = self.elapsed()
+
+    def record_hits(self, hits):
+        """Remember the retrieved (point id, Document, score) hits"""
+        self.chunks = [
+            {
+                "id": point_id,
+                "score": float(score),
+                "source": doc.metadata.get("source"),
+                "title": doc.metadata.get("title"),
+            }
+            for point_id, doc, score in hits
+        ]
+
+    def record_tokens(self, messages, answer, usage=None):
+        """Use the API's usage metadata when present, else estimate from the text"""
+        if usage:
+            self.prompt_tokens = usage.get("input_tokens")
+            self.response_tokens = usage.get("output_tokens")
+        else:
+            self.prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+            self.response_tokens = estimate_tokens(answer)
+            self.tokens_estimated = True
+
+    def finish(self, answer=None, error=None):
+        self.answer = answer
+        self.error = error
+        self.total_time = self.elapsed()
+        if self.time_to_first_token is None and answer is not None:
+            self.time_to_first_token = self.total_time
+
+    def sources(self):
+        """Distinct sources of the retrieved chunks, best score first"""
+        seen = {}
+        for chunk in self.chunks:
+            source = chunk["source"] or "unknown"
+            if source not in seen:
+                seen[source] = chunk
+        return list(seen.values())
+
+    def to_dict(self):
+        return {
+            "collection": self.collection_name,
+            "question": self.question,
+            "route": self.route,
+            "stages": dict(self.stages),
+            "chunks": list(self.chunks),
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "cache_hits": dict(self.cache_hits),
+            "time_to_first_token": self.time_to_first_token,
+            "total_time": self.total_time,
+            "error": self.error,
+        }
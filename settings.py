@@ -0,0 +1,125 @@
+"""
+Shared configuration for the ChaiDocs app, topic modules and setup scripts.
+Every value can be overridden with an environment variable or the .env file.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Set Google API key as environment variable
+load_dotenv()
+
+gemini_api_key = os.getenv("GEMINI_API_KEY")
+if gemini_api_key:
+    os.environ["GOOGLE_API_KEY"] = gemini_api_key.strip()
+
+# Qdrant connection shared by every topic in a process
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "16"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+
+# Gemini models
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash-exp")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/text-embedding-004")
+
+# Local cache files (query embeddings, index state, page cache)
+CACHE_DIR = os.getenv(
+    "CHAI_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chai_cache")
+)
+
+# Query-embedding cache; set QUERY_CACHE_DISK=0 to keep it in memory only
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_DISK = os.getenv("QUERY_CACHE_DISK", "1") == "1"
+
+# Semantic answer cache (per collection)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+# Per-stage timeouts (seconds) for the async pipeline
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))
+GENERATE_TIMEOUT = float(os.getenv("GENERATE_TIMEOUT", "60"))
+
+# Page fetching during ingestion
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "16"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))
+FETCH_DELAY = float(os.getenv("FETCH_DELAY", "0.5"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", "1.0"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+
+# Crawl mode (setup_collections.py --crawl): follow links from each collection's
+# root URLs and sitemap.xml up to CRAWL_MAX_DEPTH links deep and CRAWL_MAX_PAGES
+# pages; collections_config can override these and add allow/deny patterns
+CRAWL_ENABLED = os.getenv("CRAWL_ENABLED", "0") == "1"
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "3"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "500"))
+CRAWL_SITEMAPS = os.getenv("CRAWL_SITEMAPS", "1") == "1"
+
+# Keep only each page's main content (article, headings, code) before chunking
+CONTENT_EXTRACTION = os.getenv("CONTENT_EXTRACTION", "1") == "1"
+
+# Chunk size for the structure-aware chunker, in approximate tokens: sizes are
+# estimated as characters / 4, not counted with the embedding model's tokenizer
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "512"))
+
+# Embedding stage during ingestion
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_RETRIES = int(os.getenv("EMBED_RETRIES", "5"))
+
+# Near-duplicate chunks (MinHash estimate of Jaccard similarity over word
+# shingles at or above DEDUP_THRESHOLD) are dropped before embedding
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+
+# BM25 lexical index: exact-term fast path and hybrid (RRF) retrieval
+LEXICAL_ENABLED = os.getenv("LEXICAL_ENABLED", "1") == "1"
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "1") == "1"
+# Fast-path confidence: terms in more than LEXICAL_COMMON_DF of a collection's chunks
+# are ignored, the rest must each be in at most LEXICAL_MAX_DF of them, and the
+# k-th hit must outscore the next by LEXICAL_MIN_MARGIN; otherwise hybrid is used
+LEXICAL_COMMON_DF = float(os.getenv("LEXICAL_COMMON_DF", "0.5"))
+LEXICAL_MAX_DF = float(os.getenv("LEXICAL_MAX_DF", "0.05"))
+LEXICAL_MIN_MARGIN = float(os.getenv("LEXICAL_MIN_MARGIN", "1.2"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+
+# Vector search backend per collection: "qdrant", or "numpy" for in-process search
+# over a local copy of the vectors, e.g. VECTOR_BACKENDS=html-docs=numpy,git-docs=numpy
+DEFAULT_VECTOR_BACKEND = os.getenv("DEFAULT_VECTOR_BACKEND", "qdrant")
+VECTOR_BACKENDS = dict(
+    item.strip().split("=", 1) for item in os.getenv("VECTOR_BACKENDS", "").split(",") if "=" in item
+)
+
+# Vector quantization applied by setup_collections.py: "none", "scalar" (int8) or
+# "binary". Quantized vectors live in RAM, the originals on disk for rescoring.
+QUANTIZATION = os.getenv("QUANTIZATION", "none")
+
+# Search-time handling of quantized collections (ignored by unquantized ones):
+# fetch limit * oversampling candidates with quantized vectors, then rescore
+# them with the originals
+SEARCH_OVERSAMPLING = float(os.getenv("SEARCH_OVERSAMPLING", "2.0"))
+SEARCH_RESCORE = os.getenv("SEARCH_RESCORE", "1") == "1"
+
+# HNSW search width per query; unset uses the collection's ef_construct
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF")) if os.getenv("SEARCH_HNSW_EF") else None
+
+# Retrieval mode per collection: "similarity", or "mmr" to trade some relevance for
+# diversity (MMR_LAMBDA: 1 = pure relevance, 0 = pure diversity) among MMR_FETCH_K
+# candidates, e.g. RETRIEVAL_MODES=html-docs=mmr,devops-docs=mmr
+DEFAULT_RETRIEVAL_MODE = os.getenv("DEFAULT_RETRIEVAL_MODE", "similarity")
+RETRIEVAL_MODES = dict(
+    item.strip().split("=", 1) for item in os.getenv("RETRIEVAL_MODES", "").split(",") if "=" in item
+)
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+
+# Approximate token budget for the retrieved context in each prompt (0 = no limit)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Request metrics: serve Prometheus text on http://<host>:METRICS_PORT/metrics (0 = off),
+# and open the app's debug sidebar by default with DEBUG_SIDEBAR=1
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+DEBUG_SIDEBAR = os.getenv("DEBUG_SIDEBAR", "0") == "1"
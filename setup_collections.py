@@ -3,100 +3,346 @@ Script to create and populate Qdrant collections for all documentation types.
 Run this script once to set up all collections before using the Streamlit app.
 """
 
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-import os
-from dotenv import load_dotenv
+from qdrant_client import QdrantClient
 
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-os.environ["GOOGLE_API_KEY"] = gemini_api_key
+import settings
+from index_state import bump_index_version
+from content_extraction import extraction_report
+from crawler import crawl_documents
+from dedup import deduplicate_chunks, embedding_savings
+from embedding_stage import embed_chunks
+from indexing import (
+    configure_hnsw, configure_quantization, delete_points_except, ensure_collection, incremental_index, split_pages,
+    upsert_chunks,
+)
+from lexical_index import build_lexical_index
+from numpy_index import build_numpy_index
+from page_fetcher import load_documents
+from structured_chunking import StructuredTextSplitter
 
 # Initialize embeddings
 embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004"
+    model=settings.EMBEDDING_MODEL
 )
 
-# Text splitter configuration
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=2000,
-    chunk_overlap=200
-)
+# Split on headings into chunks of ~CHUNK_TOKENS (characters / 4) that keep code blocks whole
+text_splitter = StructuredTextSplitter(max_tokens=settings.CHUNK_TOKENS)
 
-def create_collection(collection_name, urls):
-    """Create a Qdrant collection from web URLs"""
+def create_collection(
+    collection_name, urls, incremental=False, concurrency_gate=None, quantization=None, hnsw=None, dedup=True,
+    crawl=None,
+):
+    """Create a Qdrant collection from web URLs and return a summary of the run.
+
+    With `crawl` (a dict of crawler.crawl options, possibly empty) the URLs
+    are crawl roots instead of the only pages to index.
+    """
     print(f"Creating collection: {collection_name}")
+    summary = {
+        "collection": collection_name, "pages": 0, "chunks": 0, "duplicates": 0, "seconds": 0.0, "failures": 0,
+        "ok": False,
+    }
+    dedup_threshold = settings.DEDUP_THRESHOLD if dedup else None
+    started = time.perf_counter()
+    
+    def report_progress(progress):
+        print(
+            f"  [{collection_name}] Embedded {progress['chunks_done']}/{progress['chunks_total']} chunks | "
+            f"{progress['chunks_per_second']:.1f} chunks/s | ~{progress['tokens_per_second']:.0f} tokens/s"
+        )
+    embed_kwargs = {"concurrency_gate": concurrency_gate, "on_progress": report_progress}
     
     try:
-        # Load documents from URLs
-        loader = WebBaseLoader(urls)
-        docs = loader.load()
-        print(f"Loaded {len(docs)} documents")
+        # Load documents from URLs (concurrently, with retries and the page cache).
+        # The extraction report covers the pages parsed here (not 304s skipped by --incremental).
+        report = [] if settings.CONTENT_EXTRACTION else None
+        if crawl is not None:
+            docs, fetches, crawl_stats = crawl_documents(urls, skip_unchanged=incremental, report=report, **crawl)
+            print(
+                f"Crawled {crawl_stats['pages']} pages ({crawl_stats['sitemap_urls']} from sitemaps, "
+                f"{crawl_stats['depth']} links deep) in {crawl_stats['seconds']:.1f}s | "
+                f"duplicates skipped: {crawl_stats['duplicates']}, non-HTML: {crawl_stats['non_html']}, "
+                f"failed: {crawl_stats['failed']}"
+            )
+        else:
+            docs, fetches = load_documents(urls, skip_unchanged=incremental, report=report)
+        for fetch in fetches:
+            if fetch["html"] is None:
+                status = f"failed ({fetch['error']})"
+            elif fetch["not_modified"]:
+                status = "not modified"
+            else:
+                status = "ok"
+            print(f"  {fetch['url']}: {status} in {fetch['seconds']:.2f}s, {fetch['attempts']} attempt(s)")
+        failed_urls = [fetch["url"] for fetch in fetches if fetch["html"] is None]
+        unchanged_pages = {fetch["url"]: fetch["html"] for fetch in fetches if fetch["not_modified"]}
+        summary["pages"] = len(docs) + (len(unchanged_pages) if incremental else 0)
+        summary["failures"] = len(failed_urls)
+        print(f"Loaded {summary['pages']} documents")
+        if report:
+            print_extraction_report(report)
+        
+        if incremental:
+            # Only embed new or changed chunks and drop the ones that disappeared
+            client = QdrantClient(url=settings.QDRANT_URL)
+            stats = incremental_index(
+                client, collection_name, docs, text_splitter, embeddings,
+                keep_sources=failed_urls, unchanged_pages=unchanged_pages, dedup_threshold=dedup_threshold,
+                **embed_kwargs
+            )
+            print(
+                f"Pages unchanged: {stats['pages_unchanged']}, changed: {stats['pages_changed']} | "
+                f"chunks kept: {stats['chunks_kept']}, added: {stats['chunks_added']}, "
+                f"deleted: {stats['chunks_deleted']}, near-duplicates skipped: {stats['chunks_duplicate']}"
+            )
+            if client.collection_exists(collection_name):
+                if hnsw:
+                    configure_hnsw(client, collection_name, hnsw)
+                if quantization:
+                    configure_quantization(client, collection_name, quantization)
+            if stats["chunks_added"] or stats["chunks_deleted"]:
+                build_lexical_index(client, collection_name)
+                build_numpy_index(client, collection_name)
+                bump_index_version(collection_name)
+            summary["chunks"] = stats["chunks_added"]
+            summary["duplicates"] = stats["chunks_duplicate"]
+            summary["ok"] = True
+            print(f"✅ Successfully updated collection: {collection_name}")
+            return summary
         
-        # Split documents
-        splits = text_splitter.split_documents(docs)
+        # Split documents (point IDs follow from URL and chunk text, so a rebuild overwrites)
+        splits, ids = split_pages(docs, text_splitter)
         print(f"Created {len(splits)} text chunks")
+        if dedup_threshold:
+            splits, ids, dedup_stats = deduplicate_chunks(splits, ids, threshold=dedup_threshold)
+            savings = embedding_savings(dedup_stats, settings.EMBED_BATCH_SIZE)
+            summary["duplicates"] = dedup_stats["duplicates"]
+            print(
+                f"Dropped {dedup_stats['duplicates']} near-duplicate chunks "
+                f"({dedup_stats['cross_source_duplicates']} across URLs, {dedup_stats['groups']} groups): "
+                f"{savings['embedding_calls_saved']} embedding calls and {savings['vectors_saved']} vectors saved"
+            )
+        if not splits:
+            print(f"❌ No content to index for {collection_name}")
+            return summary
         
-        # Create vector store
-        vectorstore = QdrantVectorStore.from_documents(
-            splits,
-            embeddings,
-            url="http://localhost:6333",
-            collection_name=collection_name
-        )
+        # Embed in throttled batches, then store the vectors
+        vectors = embed_chunks(splits, embeddings, **embed_kwargs)
+        client = QdrantClient(url=settings.QDRANT_URL)
+        if not ensure_collection(client, collection_name, len(vectors[0]), hnsw=hnsw) and hnsw:
+            configure_hnsw(client, collection_name, hnsw)
+        upsert_chunks(client, collection_name, splits, vectors, ids=ids)
+        # Drop points left over from an earlier build, except those of pages that failed to download
+        deleted = delete_points_except(client, collection_name, set(ids), keep_sources=failed_urls)
+        if deleted:
+            print(f"Deleted {deleted} chunks no longer in the documentation")
+        if quantization:
+            configure_quantization(client, collection_name, quantization)
+        build_lexical_index(client, collection_name)
+        build_numpy_index(client, collection_name)
         
+        # Invalidate answers cached against the previous contents
+        bump_index_version(collection_name)
+
+        summary["chunks"] = len(splits)
+        summary["ok"] = True
         print(f"✅ Successfully created collection: {collection_name}")
-        return vectorstore
+        return summary
         
     except Exception as e:
+        summary["failures"] += 1
         print(f"❌ Error creating collection {collection_name}: {str(e)}")
-        return None
+        return summary
+    finally:
+        summary["seconds"] = time.perf_counter() - started
 
-# Define collections and their URLs
+def print_extraction_report(pages):
+    """Print chunks and tokens with full-page text versus extracted main content"""
+    totals, rows = extraction_report(pages, text_splitter)
+    for row in rows:
+        print(
+            f"  {row['url']}: {row['method']} extraction, chunks {row['chunks_before']} -> {row['chunks_after']}, "
+            f"~tokens {row['tokens_before']} -> {row['tokens_after']}"
+        )
+    if totals["tokens_before"]:
+        saved = 1 - totals["tokens_after"] / totals["tokens_before"]
+        print(
+            f"Content extraction: chunks {totals['chunks_before']} -> {totals['chunks_after']}, "
+            f"~tokens {totals['tokens_before']} -> {totals['tokens_after']} ({saved:.0%} fewer to embed)"
+        )
+
+def print_summary(summaries):
+    """Print one line per collection with pages, chunks, time and failures"""
+    print(f"\n{'Collection':<14} {'Pages':>6} {'Chunks':>7} {'Dups':>6} {'Seconds':>8} {'Failures':>9}  Status")
+    for summary in summaries:
+        status = "✅" if summary["ok"] else "❌"
+        print(
+            f"{summary['collection']:<14} {summary['pages']:>6} {summary['chunks']:>7} {summary['duplicates']:>6} "
+            f"{summary['seconds']:>8.1f} {summary['failures']:>9}  {status}"
+        )
+
+# Define collections, their URLs and HNSW graph settings (m: links per node,
+# ef_construct: build-time search width). Tune them with benchmark_hnsw.py.
+# With --crawl the URLs are crawl roots, and "crawl" narrows what is followed:
+# "allow"/"deny" regexes (by default everything under a root is allowed) and
+# optional "max_depth"/"max_pages" overriding CRAWL_MAX_DEPTH/CRAWL_MAX_PAGES.
 collections_config = {
-    "html-docs": [
-        "https://developer.mozilla.org/en-US/docs/Web/HTML",
-        "https://www.w3schools.com/html/",
-        "https://html.spec.whatwg.org/",
-    ],
-    "git-docs": [
-        "https://git-scm.com/doc",
-        "https://docs.github.com/en/get-started",
-        "https://www.atlassian.com/git/tutorials",
-    ],
-    "sql-docs": [
-        "https://dev.mysql.com/doc/",
-        "https://www.postgresql.org/docs/",
-        "https://www.w3schools.com/sql/",
-    ],
-    "cpp-docs": [
-        "https://en.cppreference.com/",
-        "https://www.learncpp.com/",
-        "https://isocpp.org/",
-    ],
-    "django-docs": [
-        "https://docs.djangoproject.com/en/stable/",
-        "https://www.djangoproject.com/start/",
-        "https://tutorial.djangogirls.org/en/",
-    ],
-    "devops-docs": [
-        "https://docs.docker.com/",
-        "https://kubernetes.io/docs/",
-        "https://docs.aws.amazon.com/",
-    ]
+    "html-docs": {
+        "urls": [
+            "https://developer.mozilla.org/en-US/docs/Web/HTML",
+            "https://www.w3schools.com/html/",
+            "https://html.spec.whatwg.org/",
+        ],
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "crawl": {
+            "allow": [
+                r"^https://developer\.mozilla\.org/en-US/docs/Web/HTML",
+                r"^https://www\.w3schools\.com/html/",
+                r"^https://html\.spec\.whatwg\.org/multipage/",
+            ],
+        },
+    },
+    "git-docs": {
+        "urls": [
+            "https://git-scm.com/doc",
+            "https://docs.github.com/en/get-started",
+            "https://www.atlassian.com/git/tutorials",
+        ],
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "crawl": {
+            "allow": [
+                r"^https://git-scm\.com/(?:doc|docs|book/en/v2)",
+                r"^https://docs\.github\.com/en/get-started",
+                r"^https://www\.atlassian\.com/git/tutorials",
+            ],
+        },
+    },
+    "sql-docs": {
+        "urls": [
+            "https://dev.mysql.com/doc/",
+            "https://www.postgresql.org/docs/",
+            "https://www.w3schools.com/sql/",
+        ],
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "crawl": {
+            "allow": [
+                r"^https://dev\.mysql\.com/doc/refman/8\.4/en/",
+                r"^https://www\.postgresql\.org/docs/current/",
+                r"^https://www\.w3schools\.com/sql/",
+            ],
+        },
+    },
+    "cpp-docs": {
+        "urls": [
+            "https://en.cppreference.com/",
+            "https://www.learncpp.com/",
+            "https://isocpp.org/",
+        ],
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "crawl": {
+            "allow": [
+                r"^https://en\.cppreference\.com/w/cpp",
+                r"^https://www\.learncpp\.com/cpp-tutorial/",
+                r"^https://isocpp\.org/wiki/faq",
+            ],
+            "deny": [r"[?&](?:action|oldid)="],
+        },
+    },
+    "django-docs": {
+        "urls": [
+            "https://docs.djangoproject.com/en/stable/",
+            "https://www.djangoproject.com/start/",
+            "https://tutorial.djangogirls.org/en/",
+        ],
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "crawl": {
+            "deny": [r"/releases/", r"/_modules/", r"/search/"],
+        },
+    },
+    "devops-docs": {
+        "urls": [
+            "https://docs.docker.com/",
+            "https://kubernetes.io/docs/",
+            "https://docs.aws.amazon.com/",
+        ],
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "crawl": {
+            "allow": [
+                r"^https://docs\.docker\.com/(?:get-started|engine|build|compose)/",
+                r"^https://kubernetes\.io/docs/",
+                r"^https://docs\.aws\.amazon\.com/(?:ec2|s3|eks|ecs|lambda|iam)/",
+            ],
+            "max_depth": 2,
+        },
+    }
 }
 
 def main():
+    parser = argparse.ArgumentParser(description="Create and populate the Qdrant documentation collections")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only embed new or changed chunks and delete removed ones instead of rebuilding",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of collections to build in parallel",
+    )
+    parser.add_argument(
+        "--only",
+        default="",
+        help="comma-separated collections to build, e.g. html-docs,git-docs",
+    )
+    parser.add_argument(
+        "--embed-concurrency",
+        type=int,
+        default=settings.EMBED_MAX_IN_FLIGHT,
+        help="embedding batches in flight across all collections",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["none", "scalar", "binary"],
+        default=settings.QUANTIZATION,
+        help="quantize vectors in RAM (int8 or binary) and keep the originals on disk for rescoring",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        default=not settings.DEDUP_ENABLED,
+        help="embed every chunk, even near-duplicates",
+    )
+    parser.add_argument(
+        "--crawl",
+        action="store_true",
+        default=settings.CRAWL_ENABLED,
+        help="crawl each collection's site (links and sitemap.xml) from its URLs instead of indexing only those pages",
+    )
+    parser.add_argument("--max-pages", type=int, help="pages to crawl per collection (overrides the config)")
+    parser.add_argument("--max-depth", type=int, help="links to follow from a root URL (overrides the config)")
+    args = parser.parse_args()
+    
+    selected = collections_config
+    if args.only:
+        names = [name.strip() for name in args.only.split(",") if name.strip()]
+        unknown = [name for name in names if name not in collections_config]
+        if unknown:
+            parser.error(f"unknown collection(s): {', '.join(unknown)}")
+        selected = {name: collections_config[name] for name in names}
+    
     print("🚀 Starting Qdrant collections setup...")
-    print("Make sure Docker and Qdrant are running on localhost:6333")
+    print(f"Make sure Docker and Qdrant are running on {settings.QDRANT_URL}")
     
     # Test connection to Qdrant
     try:
-        from qdrant_client import QdrantClient
-        client = QdrantClient(url="http://localhost:6333")
+        client = QdrantClient(url=settings.QDRANT_URL)
         collections = client.get_collections()
         print(f"✅ Connected to Qdrant. Existing collections: {len(collections.collections)}")
     except Exception as e:
@@ -104,11 +350,29 @@ def main():
         print("Please make sure Qdrant is running with: docker-compose -f docker-compose.db.yml up -d")
         return
     
-    # Create each collection
-    for collection_name, urls in collections_config.items():
+    # One limit on embedding batches in flight, shared by every collection
+    embed_gate = threading.BoundedSemaphore(args.embed_concurrency)
+    
+    def build(item):
+        collection_name, config = item
         print(f"\n📚 Processing {collection_name}...")
-        create_collection(collection_name, urls)
+        crawl = None
+        if args.crawl:
+            crawl = dict(config.get("crawl", {}))
+            if args.max_pages is not None:
+                crawl["max_pages"] = args.max_pages
+            if args.max_depth is not None:
+                crawl["max_depth"] = args.max_depth
+        return create_collection(
+            collection_name, config["urls"], incremental=args.incremental, concurrency_gate=embed_gate,
+            quantization=args.quantization, hnsw=config.get("hnsw"), dedup=not args.no_dedup, crawl=crawl,
+        )
+    
+    # Create each collection, several at a time with --jobs
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        summaries = list(executor.map(build, selected.items()))
     
+    print_summary(summaries)
     print("\n🎉 Setup complete! You can now run the Streamlit app.")
 
 if __name__ == "__main__":
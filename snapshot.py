@@ -0,0 +1,180 @@
+"""
+Portable corpus snapshots: chunks, metadata and vectors in one Parquet file.
+
+Build a collection once, export it, and load the file anywhere else without
+fetching pages or calling the embeddings API:
+
+    python snapshot.py export html-docs snapshots/html-docs.parquet
+    python snapshot.py import snapshots/html-docs.parquet --collection html-docs
+    python snapshot.py import snapshots/html-docs.parquet --local-only
+
+A snapshot records the embedding model its vectors came from, and importing
+one made with a model other than settings.EMBEDDING_MODEL is refused unless
+--force is given.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient
+
+import settings
+from index_state import bump_index_version
+from indexing import ensure_collection, iter_points, upsert_chunks
+from lexical_index import BM25Index, build_lexical_index, lexical_index_path
+from numpy_index import build_numpy_index, numpy_index_dir, write_numpy_index
+
+SNAPSHOT_DIR = "snapshots"
+
+
+def export_collection(client, collection_name, path):
+    """Write every point of a collection to a Parquet file and return the point count"""
+    ids, texts, metadatas, vectors = [], [], [], []
+    for record in iter_points(client, collection_name, with_vectors=True):
+        payload = record.payload or {}
+        ids.append(str(record.id))
+        texts.append(payload.get("page_content", ""))
+        metadatas.append(json.dumps(payload.get("metadata") or {}))
+        vectors.append(record.vector)
+
+    dimension = len(vectors[0]) if vectors else 0
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dimension)
+    table = pa.table({
+        "id": pa.array(ids, pa.string()),
+        "page_content": pa.array(texts, pa.string()),
+        "metadata": pa.array(metadatas, pa.string()),
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1), pa.float32()), dimension),
+    })
+    table = table.replace_schema_metadata({
+        "collection": collection_name,
+        "embedding_model": settings.EMBEDDING_MODEL,
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pq.write_table(table, path, compression="zstd")
+    return len(ids)
+
+
+def read_snapshot(path):
+    """Return (ids, Documents, float32 vector matrix) from a snapshot file"""
+    table = pq.read_table(path)
+    ids = table.column("id").to_pylist()
+    docs = [
+        Document(page_content=text, metadata=json.loads(metadata))
+        for text, metadata in zip(table.column("page_content").to_pylist(), table.column("metadata").to_pylist())
+    ]
+    vector_column = table.column("vector").combine_chunks()
+    dimension = vector_column.type.list_size
+    vectors = vector_column.flatten().to_numpy().reshape(len(ids), dimension)
+    return ids, docs, vectors
+
+
+def snapshot_info(path):
+    """Return the collection name and embedding model recorded in a snapshot"""
+    metadata = pq.read_schema(path).metadata or {}
+    return {key: metadata[key.encode("utf-8")].decode("utf-8") for key in ("collection", "embedding_model")
+            if key.encode("utf-8") in metadata}
+
+
+def check_embedding_model(path, force=False):
+    """Raise ValueError if the snapshot's vectors come from another embedding model"""
+    model = snapshot_info(path).get("embedding_model")
+    if model is not None and model != settings.EMBEDDING_MODEL and not force:
+        raise ValueError(
+            f"{path} was embedded with {model}, but EMBEDDING_MODEL is {settings.EMBEDDING_MODEL}; "
+            "queries would be compared against incompatible vectors (use --force to import anyway)"
+        )
+
+
+def import_snapshot(client, path, collection_name=None, recreate=False, force=False):
+    """Bulk-load a snapshot into Qdrant and return the point count"""
+    check_embedding_model(path, force)
+    if collection_name is None:
+        collection_name = snapshot_info(path)["collection"]
+    ids, docs, vectors = read_snapshot(path)
+
+    if recreate and client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    ensure_collection(client, collection_name, vectors.shape[1])
+    upsert_chunks(client, collection_name, docs, vectors.tolist(), ids=ids)
+
+    build_lexical_index(client, collection_name)
+    build_numpy_index(client, collection_name)
+    bump_index_version(collection_name)
+    return len(ids)
+
+
+def import_snapshot_local(path, collection_name=None, force=False):
+    """Load a snapshot into the local NumPy and BM25 indexes only (no Qdrant)"""
+    check_embedding_model(path, force)
+    if collection_name is None:
+        collection_name = snapshot_info(path)["collection"]
+    ids, docs, vectors = read_snapshot(path)
+
+    write_numpy_index(
+        numpy_index_dir(collection_name),
+        ids,
+        [doc.page_content for doc in docs],
+        [doc.metadata for doc in docs],
+        vectors,
+    )
+    for point_id, doc in zip(ids, docs):
+        doc.metadata.update({"_id": point_id, "_collection_name": collection_name})
+    BM25Index(ids, docs).save(lexical_index_path(collection_name))
+
+    bump_index_version(collection_name)
+    return len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import Qdrant collection snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="write a collection to a Parquet snapshot")
+    export_parser.add_argument("collection")
+    export_parser.add_argument("path", nargs="?")
+
+    import_parser = subparsers.add_parser("import", help="load a Parquet snapshot into Qdrant")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--collection", help="target collection (defaults to the exported one)")
+    import_parser.add_argument("--recreate", action="store_true", help="drop the collection first")
+    import_parser.add_argument(
+        "--local-only",
+        action="store_true",
+        help="only build the local NumPy and BM25 indexes (use with VECTOR_BACKENDS=<collection>=numpy)",
+    )
+    import_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="import even if the snapshot was embedded with a different model than EMBEDDING_MODEL",
+    )
+
+    args = parser.parse_args()
+    if args.command == "import":
+        try:
+            check_embedding_model(args.path, args.force)
+        except ValueError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+    if args.command == "import" and args.local_only:
+        count = import_snapshot_local(args.path, args.collection, force=args.force)
+        print(f"✅ Imported {count} points from {args.path} into the local indexes")
+        return
+
+    client = QdrantClient(url=settings.QDRANT_URL)
+
+    if args.command == "export":
+        path = args.path or os.path.join(SNAPSHOT_DIR, f"{args.collection}.parquet")
+        count = export_collection(client, args.collection, path)
+        print(f"✅ Exported {count} points from {args.collection} to {path}")
+    else:
+        count = import_snapshot(client, args.path, args.collection, recreate=args.recreate, force=args.force)
+        print(f"✅ Imported {count} points from {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Structure-aware chunking sized in approximate tokens.
+
+Extracted pages (content_extraction.py) mark headings as
+"## Title {#anchor}" and code as ``` fences. A page is cut into sections at
+its headings, and whole consecutive sections are packed into chunks of up to
+`max_tokens`, so chunks follow the document instead of a character count and
+need no overlap. A section too large for one chunk is split between
+paragraphs, with its heading repeated on every piece. Code blocks are kept
+whole unless one alone is longer than `max_code_tokens`, in which case it is
+split between lines and each piece re-fenced. Every chunk records its
+heading path, the anchor of its first section and its offset in the page.
+
+Sizes are estimated as characters / 4 (request_trace.estimate_tokens), not
+counted with the embedding model's tokenizer; that keeps chunking offline
+and free. Code and non-English text usually have more real tokens than the
+estimate, so leave headroom below the model's input limit.
+"""
+
+import re
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from request_trace import estimate_tokens
+
+HEADING_PATTERN = re.compile(r"^(#{1,6}) (.+?)(?: \{#([^}\s]+)\})?\s*$")
+FENCE = "```"
+
+
+class _Block:
+    """A heading line, a fenced code block or a paragraph, with its page offset"""
+
+    def __init__(self, kind, text, start, level=None, title=None, anchor=None):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.level = level
+        self.title = title
+        self.anchor = anchor
+        self.tokens = estimate_tokens(text)
+
+
+class _Section:
+    def __init__(self, path, anchor, heading=None):
+        self.path = path
+        self.anchor = anchor
+        self.heading = heading
+        self.blocks = [heading] if heading else []
+
+    @property
+    def tokens(self):
+        return sum(block.tokens for block in self.blocks)
+
+
+def parse_blocks(text):
+    """Split extracted page text into heading, code and paragraph blocks"""
+    blocks = []
+    paragraph, paragraph_start = [], 0
+    code, code_start = None, 0
+    offset = 0
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(_Block("text", "\n".join(paragraph).strip(), paragraph_start))
+            paragraph.clear()
+
+    for line in text.split("\n"):
+        line_start = offset
+        offset += len(line) + 1
+        if code is not None:
+            code.append(line)
+            if line.strip().startswith(FENCE):
+                blocks.append(_Block("code", "\n".join(code), code_start))
+                code = None
+            continue
+        if line.strip().startswith(FENCE):
+            flush_paragraph()
+            code, code_start = [line], line_start
+            continue
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            flush_paragraph()
+            level, title, anchor = len(heading.group(1)), heading.group(2).strip(), heading.group(3)
+            blocks.append(_Block("heading", f"{heading.group(1)} {title}", line_start, level, title, anchor))
+            continue
+        if not line.strip():
+            flush_paragraph()
+            continue
+        if not paragraph:
+            paragraph_start = line_start
+        paragraph.append(line)
+
+    flush_paragraph()
+    if code is not None:
+        # Unterminated fence: keep what there is as code
+        blocks.append(_Block("code", "\n".join(code), code_start))
+    return [block for block in blocks if block.text]
+
+
+def parse_sections(blocks):
+    """Group blocks under their headings, tracking the heading path"""
+    sections = [_Section([], None)]
+    stack = []
+    for block in blocks:
+        if block.kind != "heading":
+            sections[-1].blocks.append(block)
+            continue
+        while stack and stack[-1].level >= block.level:
+            stack.pop()
+        stack.append(block)
+        anchor = next((heading.anchor for heading in reversed(stack) if heading.anchor), None)
+        sections.append(_Section([heading.title for heading in stack], anchor, block))
+    return [section for section in sections if section.blocks]
+
+
+def _common_prefix(paths):
+    """Heading path shared by every section in a chunk"""
+    common = list(paths[0])
+    for path in paths[1:]:
+        length = 0
+        while length < min(len(common), len(path)) and common[length] == path[length]:
+            length += 1
+        common = common[:length]
+    return common
+
+
+class StructuredTextSplitter:
+    """Split Documents on heading/section boundaries into chunks of at most `max_tokens` (estimated)"""
+
+    def __init__(self, max_tokens=512, max_code_tokens=None):
+        self.max_tokens = max_tokens
+        self.max_code_tokens = max_code_tokens or 2 * max_tokens
+        # Measured in characters (~4 per token, as estimate_tokens assumes), which add up across pieces
+        self._text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=max_tokens * 4,
+            chunk_overlap=0,
+            separators=["\n", ". ", " ", ""],
+        )
+
+    @property
+    def version(self):
+        """Chunking settings recorded on indexed points (see indexing.chunking_version)"""
+        return f"structured-1-{self.max_tokens}-{self.max_code_tokens}"
+
+    def _split_block(self, block):
+        """Break one oversized block into blocks that fit"""
+        if block.kind == "code":
+            if block.tokens <= self.max_code_tokens:
+                return [block]
+            lines = block.text.split("\n")
+            opening = lines[0]
+            body = lines[1:-1] if lines[-1].strip().startswith(FENCE) else lines[1:]
+            pieces, current = [], []
+            for line in body:
+                if current and estimate_tokens("\n".join(current + [line])) > self.max_tokens:
+                    pieces.append(current)
+                    current = []
+                current.append(line)
+            if current:
+                pieces.append(current)
+            return [_Block("code", "\n".join([opening] + piece + [FENCE]), block.start) for piece in pieces]
+
+        if block.tokens <= self.max_tokens:
+            return [block]
+        parts = []
+        search_from = 0
+        for piece in self._text_splitter.split_text(block.text):
+            position = block.text.find(piece, search_from)
+            search_from = max(position, search_from)
+            parts.append(_Block(block.kind, piece, block.start + max(position, 0)))
+        return parts
+
+    def _split_section(self, section):
+        """Pieces of a section too large for one chunk, each led by its heading"""
+        pieces = []
+        current, current_tokens = [], 0
+        body = [block for block in section.blocks if block is not section.heading]
+        heading_tokens = section.heading.tokens if section.heading else 0
+        for block in body:
+            for part in self._split_block(block):
+                if current and current_tokens + part.tokens > self.max_tokens - heading_tokens:
+                    pieces.append(current)
+                    current, current_tokens = [], 0
+                current.append(part)
+                current_tokens += part.tokens
+        if current:
+            pieces.append(current)
+        if not section.heading:
+            return pieces
+        return [[section.heading] + piece for piece in pieces] or [[section.heading]]
+
+    def _chunks(self, text):
+        """Yield (text, start offset, heading path, anchor) for each chunk"""
+        current, paths, anchor = [], [], None
+        current_tokens = 0
+
+        def emit(blocks, paths, anchor):
+            path = _common_prefix(paths) or paths[0]
+            # Pieces of a split section start where their own content starts
+            start = blocks[1].start if len(blocks) > 1 and blocks[0].kind == "heading" else blocks[0].start
+            return "\n\n".join(block.text for block in blocks), start, path, anchor
+
+        for section in parse_sections(parse_blocks(text)):
+            if section.tokens > self.max_tokens:
+                if current:
+                    yield emit(current, paths, anchor)
+                    current, paths, current_tokens = [], [], 0
+                for piece in self._split_section(section):
+                    yield emit(piece, [section.path], section.anchor)
+                continue
+            if current and current_tokens + section.tokens > self.max_tokens:
+                yield emit(current, paths, anchor)
+                current, paths, current_tokens = [], [], 0
+            if not current:
+                anchor = section.anchor
+            current.extend(section.blocks)
+            paths.append(section.path)
+            current_tokens += section.tokens
+        if current:
+            yield emit(current, paths, anchor)
+
+    def split_text(self, text):
+        return [chunk for chunk, _, _, _ in self._chunks(text)]
+
+    def split_documents(self, documents):
+        """Split Documents, adding heading_path, anchor, start_index and chunk_tokens metadata"""
+        chunks = []
+        for doc in documents:
+            for text, start, path, anchor in self._chunks(doc.page_content):
+                metadata = dict(doc.metadata)
+                metadata["heading_path"] = " > ".join(path)
+                if anchor:
+                    metadata["anchor"] = anchor
+                metadata["start_index"] = start
+                metadata["chunk_tokens"] = estimate_tokens(text)
+                chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
@@ -1,5 +1,3 @@
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -7,6 +5,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 import json
 from dotenv import load_dotenv
+from ingest_state import ensure_indexed, parse_index_args
 
 # Set Google API key as environment variable
 load_dotenv()
@@ -25,28 +24,22 @@ urls = [
     "https://docs.chaicode.com/youtube/chai-aur-git/github/",
 ]
 
-loader = WebBaseLoader(urls)
-docs = loader.load()
-
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-split_docs = text_splitter.split_documents(docs)
+args = parse_index_args("Git")
 
 embeddings = GoogleGenerativeAIEmbeddings(
     model="models/text-embedding-004"
     )
 
-# Create vector store (uncommented to create the collection)
-vector_store = QdrantVectorStore.from_documents(
-    documents=split_docs,
-    url="http://localhost:6333",
+# Only scrape and embed when the URL list or splitter settings changed
+ensure_indexed(
     collection_name="git-docs",
-    embedding=embeddings
+    urls=urls,
+    embeddings=embeddings,
+    chunk_tokens=256,
+    reindex=args.reindex,
+    query_only=args.query_only,
 )
 
-print("Docs length",len(docs))
-print("Split docs length",len(split_docs))
-print("Indexing done")
-
 retriever = QdrantVectorStore.from_existing_collection(
     url="http://localhost:6333",
     collection_name="git-docs",
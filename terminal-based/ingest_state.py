@@ -0,0 +1,147 @@
+"""
+Skip re-scraping and re-indexing when a terminal chatbot starts.
+
+Each script fingerprints its URL list, splitter and extraction versions and
+embedding model. Ingestion only runs when the stored fingerprint for the
+collection differs (or the collection has no points for these URLs, e.g.
+after setup_collections.py replaced them), or when --reindex is passed.
+--query-only never ingests. Pages are fetched through the page cache shared with
+setup_collections.py, so unchanged pages are revalidated instead of
+downloaded again. The fingerprint is only saved once every page was
+fetched, so failed pages are retried on the next start. After writing, the
+collection's BM25 and NumPy indexes are rebuilt and its index version is
+bumped, so the app's answer cache and local indexes follow the new contents.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient, models
+
+# The page fetcher and cache live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import settings
+from content_extraction import EXTRACTION_VERSION
+from index_state import bump_index_version
+from lexical_index import build_lexical_index
+from numpy_index import build_numpy_index
+from page_fetcher import load_documents
+from structured_chunking import StructuredTextSplitter
+
+FINGERPRINTS_PATH = os.path.join(settings.CACHE_DIR, "terminal_fingerprints.json")
+
+
+def parse_index_args(topic):
+    parser = argparse.ArgumentParser(description=f"{topic} tutor chatbot")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--reindex", action="store_true", help="scrape and re-index even if nothing changed")
+    mode.add_argument("--query-only", action="store_true", help="never scrape; use the collection as it is")
+    return parser.parse_args()
+
+
+def ingestion_fingerprint(collection_name, urls, chunk_tokens, embedding_model):
+    inputs = {
+        "collection": collection_name,
+        "urls": list(urls),
+        "chunker": StructuredTextSplitter(max_tokens=chunk_tokens).version,
+        "chunk_tokens": chunk_tokens,
+        "embedding_model": embedding_model,
+        "content_extraction": settings.CONTENT_EXTRACTION,
+        "extraction_version": EXTRACTION_VERSION,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _load_fingerprints():
+    try:
+        with open(FINGERPRINTS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_fingerprint(collection_name, fingerprint):
+    fingerprints = _load_fingerprints()
+    fingerprints[collection_name] = fingerprint
+    os.makedirs(os.path.dirname(FINGERPRINTS_PATH), exist_ok=True)
+    with open(FINGERPRINTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=2)
+
+
+def _sources_filter(urls):
+    return models.Filter(
+        must=[models.FieldCondition(key="metadata.source", match=models.MatchAny(any=list(urls)))]
+    )
+
+
+def ensure_indexed(
+    collection_name,
+    urls,
+    embeddings,
+    chunk_tokens=256,
+    qdrant_url="http://localhost:6333",
+    reindex=False,
+    query_only=False,
+):
+    """Scrape and index `urls` into the collection unless it is already up to date"""
+    if query_only:
+        print("Query-only mode: skipping ingestion")
+        return
+
+    fingerprint = ingestion_fingerprint(
+        collection_name, urls, chunk_tokens, getattr(embeddings, "model", "")
+    )
+    client = QdrantClient(url=qdrant_url)
+    exists = client.collection_exists(collection_name)
+    # The collection is shared with setup_collections.py, which may delete these pages
+    if (
+        not reindex
+        and exists
+        and _load_fingerprints().get(collection_name) == fingerprint
+        and client.count(collection_name, count_filter=_sources_filter(urls)).count > 0
+    ):
+        print("Collection is up to date, skipping ingestion (use --reindex to force)")
+        return
+
+    docs, fetches = load_documents(urls)
+    failed = [fetch for fetch in fetches if fetch["html"] is None]
+    for fetch in failed:
+        print(f"Could not fetch {fetch['url']}: {fetch['error']}")
+
+    text_splitter = StructuredTextSplitter(max_tokens=chunk_tokens)
+    split_docs = text_splitter.split_documents(docs)
+    if not split_docs:
+        print("Nothing to index, keeping the collection as it is (ingestion is retried on the next start)")
+        return
+
+    # Replace the pages fetched this run instead of appending duplicates
+    if exists and docs:
+        client.delete(
+            collection_name,
+            points_selector=_sources_filter(doc.metadata["source"] for doc in docs),
+        )
+
+    QdrantVectorStore.from_documents(
+        documents=split_docs,
+        url=qdrant_url,
+        collection_name=collection_name,
+        embedding=embeddings
+    )
+
+    # Keep the app's local indexes and cached answers in step with the collection
+    build_lexical_index(client, collection_name)
+    build_numpy_index(client, collection_name)
+    bump_index_version(collection_name)
+
+    if failed:
+        print(f"{len(failed)} page(s) failed, ingestion will run again on the next start")
+    else:
+        _save_fingerprint(collection_name, fingerprint)
+
+    print("Docs length",len(docs))
+    print("Split docs length",len(split_docs))
+    print("Indexing done")
@@ -0,0 +1,174 @@
+"""
+page_fetcher tests against a local aiohttp fixture server.
+
+Run with: python -m pytest tests
+"""
+
+import asyncio
+
+from aiohttp import web
+
+from page_cache import PageCache
+from page_fetcher import fetch_all
+
+PAGE = "<html><head><title>Fixture</title></head><body><main><h1>Fixture</h1><p>Hello</p></main></body></html>"
+
+
+class FixtureServer:
+    """Serves a few routes and records how requests arrived"""
+
+    def __init__(self):
+        self.hits = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = web.Application()
+        self.app.router.add_get("/ok", self.ok)
+        self.app.router.add_get("/missing", self.missing)
+        self.app.router.add_get("/rate-limited", self.rate_limited)
+        self.app.router.add_get("/flaky", self.flaky)
+        self.app.router.add_get("/etag", self.etag)
+        self.app.router.add_get("/slow/{n}", self.slow)
+        self.runner = None
+        self.base_url = None
+
+    def _count(self, request):
+        self.hits[request.path] = self.hits.get(request.path, 0) + 1
+        return self.hits[request.path]
+
+    async def ok(self, request):
+        self._count(request)
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def missing(self, request):
+        self._count(request)
+        return web.Response(status=404, text="not here")
+
+    async def rate_limited(self, request):
+        if self._count(request) == 1:
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def flaky(self, request):
+        if self._count(request) <= 2:
+            return web.Response(status=503)
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def etag(self, request):
+        self._count(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(text=PAGE, content_type="text/html", headers={"ETag": '"v1"'})
+
+    async def slow(self, request):
+        self._count(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.in_flight -= 1
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def fetch(paths, cache=None, **kwargs):
+    """Start a fixture server, fetch `paths` from it and return (results, server)"""
+    kwargs.setdefault("delay", 0)
+    kwargs.setdefault("backoff", 0.01)
+    kwargs.setdefault("retries", 3)
+    kwargs.setdefault("timeout", 5)
+
+    async def run():
+        server = FixtureServer()
+        await server.start()
+        try:
+            urls = [server.base_url + path for path in paths]
+            return await fetch_all(urls, cache=cache, **kwargs), server
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_ok_page():
+    (result,), _ = fetch(["/ok"])
+    assert result["status"] == 200
+    assert result["html"] == PAGE
+    assert result["error"] is None
+    assert result["attempts"] == 1
+    assert result["content_type"] == "text/html"
+
+
+def test_404_is_not_retried():
+    (result,), server = fetch(["/missing"])
+    assert result["status"] == 404
+    assert result["html"] is None
+    assert result["error"] == "HTTP 404"
+    assert result["attempts"] == 1
+    assert server.hits["/missing"] == 1
+
+
+def test_429_waits_for_retry_after():
+    (result,), server = fetch(["/rate-limited"])
+    assert result["status"] == 200
+    assert result["html"] == PAGE
+    assert result["attempts"] == 2
+    assert server.hits["/rate-limited"] == 2
+    # backoff is 10ms, so the wait came from Retry-After: 1
+    assert result["seconds"] >= 1.0
+
+
+def test_5xx_is_retried_until_success():
+    (result,), server = fetch(["/flaky"])
+    assert result["status"] == 200
+    assert result["html"] == PAGE
+    assert result["attempts"] == 3
+    assert server.hits["/flaky"] == 3
+
+
+def test_5xx_gives_up_after_retries():
+    (result,), server = fetch(["/flaky"], retries=1)
+    assert result["status"] == 503
+    assert result["html"] is None
+    assert result["error"] == "HTTP 503"
+    assert server.hits["/flaky"] == 2
+
+
+def test_304_reuses_cached_html(tmp_path):
+    cache = PageCache(str(tmp_path))
+
+    async def run():
+        server = FixtureServer()
+        await server.start()
+        try:
+            url = server.base_url + "/etag"
+            first = await fetch_all([url], cache=cache, delay=0)
+            second = await fetch_all([url], cache=cache, delay=0)
+            return first[0], second[0], url
+        finally:
+            await server.stop()
+
+    first, second, url = asyncio.run(run())
+    assert first["status"] == 200 and not first["not_modified"]
+    assert cache.get(url)["etag"] == '"v1"'
+    assert second["status"] == 304
+    assert second["not_modified"]
+    assert second["html"] == PAGE
+
+
+def test_per_host_connection_limit():
+    paths = [f"/slow/{n}" for n in range(8)]
+    results, server = fetch(paths, per_host=2, max_connections=16)
+    assert all(result["status"] == 200 for result in results)
+    assert [result["url"] for result in results] == [server.base_url + path for path in paths]
+    assert server.max_in_flight == 2
@@ -0,0 +1,52 @@
+"""
+Registry of the documentation topics served by the Streamlit app.
+Topics are loaded lazily, so a topic's Qdrant collection is only connected
+the first time somebody chats with that topic.
+"""
+
+import importlib
+import threading
+
+# Topic name -> sidebar button key, button label and the module answering it
+TOPICS = {
+    "HTML": {"key": "html", "label": "HTML Documentation", "module": "html_docs"},
+    "Git": {"key": "git", "label": "Git Documentation", "module": "git_docs"},
+    "SQL": {"key": "sql", "label": "SQL Documentation", "module": "sql_docs"},
+    "C++": {"key": "cpp", "label": "C++ Documentation", "module": "cpp_docs"},
+    "Django": {"key": "django", "label": "Django Documentation", "module": "django_docs"},
+    "DevOps": {"key": "devops", "label": "DevOps Documentation", "module": "devops_docs"},
+}
+
+_warm_threads = {}
+_warm_lock = threading.Lock()
+
+
+def load_topic(topic):
+    """Return the connected DocsEngine answering questions for a topic"""
+    engine = importlib.import_module(TOPICS[topic]["module"]).engine
+    engine.warm()
+    return engine
+
+
+def warm_topic(topic, loader=load_topic):
+    """Build a topic's engine in a background thread.
+
+    `loader` is called with the topic name; the app passes its cached loader
+    so the warmed engine is the one later requests reuse. Failures are left
+    for the foreground call to report.
+    """
+    with _warm_lock:
+        thread = _warm_threads.get(topic)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def _warm():
+            try:
+                loader(topic)
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=_warm, name=f"warm-{TOPICS[topic]['key']}", daemon=True)
+        _warm_threads[topic] = thread
+        thread.start()
+        return thread